@@ -0,0 +1,138 @@
+# coding: utf-8
+#
+# Usage:
+#   python benchmarks/data_pipeline.py
+#   python benchmarks/data_pipeline.py --sentences 100000 --lengths lognormal --save_baseline benchmarks/baseline.json
+#   python benchmarks/data_pipeline.py --baseline benchmarks/baseline.json
+#
+# Purpose:
+#   Time the hot paths of data/data.py on a synthetic corpus.
+#   With --baseline, exit with status 1 if a function got slower than tolerance.
+
+import argparse
+import json
+import sys
+import timeit
+
+import numpy as np
+
+from data.data import batchnize, build_dictionary, padding, sentence_to_onehot, seq2seq, through
+
+
+def synthetic_corpus(sentences: int, mean_length: float, lengths='uniform', words=50000, seed=0) -> list:
+  """Sentences of Zipf distributed words, lengths are uniform | poisson | lognormal around mean_length."""
+  random = np.random.RandomState(seed)
+  if lengths == 'uniform':
+    sizes = random.randint(1, int(2 * mean_length), size=sentences)
+  elif lengths == 'poisson':
+    sizes = random.poisson(mean_length, size=sentences)
+  elif lengths == 'lognormal':
+    sigma = 0.5
+    sizes = random.lognormal(np.log(mean_length) - sigma ** 2 / 2, sigma, size=sentences).astype(int)
+  else:
+    raise ValueError('unknown length distribution: %s' % lengths)
+  sizes = np.maximum(sizes, 1)
+  ids = np.minimum(random.zipf(1.2, size=sizes.sum()), words)
+  tokens = np.array(['w%d' % i for i in range(words + 1)])[ids]
+  offsets = np.concatenate([[0], np.cumsum(sizes)])
+  return [' '.join(tokens[offsets[i]:offsets[i + 1]]) for i in range(sentences)]
+
+def measure(function, calls: int, tokens: int, repeat: int) -> dict:
+  """Best of repeat runs of function, which makes calls calls over tokens tokens."""
+  seconds = min(timeit.repeat(function, number=1, repeat=repeat))
+  return {'calls': calls,
+          'tokens': tokens,
+          'per_call_us': seconds / calls * 1e6,
+          'per_token_ns': seconds / tokens * 1e9}
+
+def run(args) -> dict:
+  lines = synthetic_corpus(args.sentences, args.mean_length, args.lengths, args.words)
+  words = [word for line in lines for word in line.split()]
+  dictionary, _ = build_dictionary(words, args.vocabulary_size)
+  datas = [np.array(sentence_to_onehot(line, dictionary)) for line in lines]
+  num_batches = len(datas) // args.batch_size
+  batches = [batchnize(datas, args.batch_size, i)[0] for i in range(num_batches)]
+  batch_tokens = sum(min(len(data), args.max_time) for batch in batches for data in batch)
+  clipped_tokens = sum(min(len(data), args.max_time) for data in datas)
+
+  def batchnize_all():
+    idx = 0
+    for _ in range(num_batches):
+      _, idx = batchnize(datas, args.batch_size, idx)
+
+  def seq2seq_all():
+    for batch in batches:
+      seq2seq(batch, batch, args.max_time, args.vocabulary_size)
+
+  def through_all():
+    for batch in batches:
+      through(batch, args.max_time, args.batch_size, args.vocabulary_size)
+
+  results = {
+      'sentence_to_onehot': measure(lambda: [sentence_to_onehot(line, dictionary) for line in lines],
+                                    len(lines), len(words), args.repeat),
+      'build_dictionary': measure(lambda: build_dictionary(words, args.vocabulary_size),
+                                  1, len(words), args.repeat),
+      'padding': measure(lambda: [padding(data, args.max_time) for data in datas],
+                         len(datas), clipped_tokens, args.repeat),
+      'batchnize': measure(batchnize_all, num_batches, batch_tokens, args.repeat),
+      'seq2seq': measure(seq2seq_all, num_batches, batch_tokens, args.repeat),
+      'through': measure(through_all, num_batches, batch_tokens, args.repeat)}
+  settings = dict((k, getattr(args, k)) for k in
+                  ('sentences', 'mean_length', 'lengths', 'words', 'vocabulary_size', 'max_time', 'batch_size'))
+  return {'settings': settings, 'results': results}
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+  """Names of functions whose per token cost exceeds baseline by more than tolerance."""
+  if report['settings'] != baseline['settings']:
+    print('warning: settings differ from baseline %s' % baseline['settings'], file=sys.stderr)
+  slower = []
+  for name, result in report['results'].items():
+    if not name in baseline['results']:
+      continue
+    ratio = result['per_token_ns'] / baseline['results'][name]['per_token_ns']
+    result['ratio'] = ratio
+    if ratio > 1 + tolerance:
+      slower.append(name)
+  return slower
+
+def main(args):
+  report = run(args)
+  slower = []
+  if args.baseline is not None:
+    with open(args.baseline) as f:
+      slower = compare(report, json.load(f), args.tolerance)
+
+  print('%-20s %10s %14s %14s %8s' % ('function', 'calls', 'us/call', 'ns/token', 'ratio'))
+  for name, result in report['results'].items():
+    ratio = '%.2f' % result['ratio'] if 'ratio' in result else '-'
+    mark = ' SLOWER' if name in slower else ''
+    print('%-20s %10d %14.2f %14.2f %8s%s' % (
+        name, result['calls'], result['per_call_us'], result['per_token_ns'], ratio, mark))
+
+  if args.output is not None:
+    with open(args.output, 'w') as f:
+      f.write(json.dumps(report, indent=2) + '\n')
+  if args.save_baseline is not None:
+    with open(args.save_baseline, 'w') as f:
+      f.write(json.dumps(report, indent=2) + '\n')
+    print('save baseline at %s' % args.save_baseline)
+  if slower:
+    sys.exit(1)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--sentences', type=int, default=20000, help='number of synthetic sentences')
+  parser.add_argument('--mean_length', type=float, default=25, help='mean number of words per sentence')
+  parser.add_argument('--lengths', type=str, default='uniform', help='uniform | poisson | lognormal')
+  parser.add_argument('--words', type=int, default=50000, help='number of distinct synthetic words')
+  parser.add_argument('--vocabulary_size', type=int, default=20000, help='vocabulary_size of build_dictionary')
+  parser.add_argument('--max_time', type=int, default=80, help='max_time of padding and seq2seq')
+  parser.add_argument('--batch_size', type=int, default=128, help='batch_size of batchnize and seq2seq')
+  parser.add_argument('--repeat', type=int, default=3, help='best of repeat runs is reported')
+  parser.add_argument('--baseline', type=str, default=None, help='baseline JSON to compare with')
+  parser.add_argument('--tolerance', type=float, default=0.1, help='allowed slowdown ratio against baseline')
+  parser.add_argument('--save_baseline', type=str, default=None, help='save results as a baseline JSON')
+  parser.add_argument('--output', '-o', type=str, default=None, help='JSON output path')
+  args = parser.parse_args()
+  main(args)
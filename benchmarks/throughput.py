@@ -0,0 +1,98 @@
+# coding: utf-8
+#
+# Usage:
+#   python benchmarks/throughput.py
+#   python benchmarks/throughput.py -c configs/attention_nmt.ini -s 200 -o throughput.json
+#
+# Purpose:
+#   Measure training throughput of the NMT models on synthetic data.
+#   Each config runs in a fresh process, so peak RSS is per model.
+
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from configs.configs import Configs
+from data.data import through
+from models.seq2seq import Seq2SeqModel, session_config
+
+CONFIGS = ['configs/basic_nmt.ini',
+           'configs/multi_layer_nmt.ini',
+           'configs/attention_nmt.ini',
+           'configs/bidirectional_attention_nmt.ini',
+           'configs/bidirectional_attention_multi_layer_nmt.ini']
+
+
+def synthetic_batches(num_batches: int, max_time: int, batch_size: int, vocabulary_size: int) -> list:
+  np.random.seed(0)
+  return [through([], max_time, batch_size, vocabulary_size) for _ in range(num_batches)]
+
+def benchmark(config: str, steps: int, warmup: int, batch_size=None) -> dict:
+  """Run train_op for warmup + steps steps, then summarize the last steps."""
+  c = Configs(config)
+  if batch_size is not None:
+    c.option['batch_size'] = batch_size
+  max_time = c.option['max_time']
+  batch_size = c.option['batch_size']
+  batches = synthetic_batches(min(steps, 16), max_time, batch_size, c.option['vocabulary_size'])
+
+  model = Seq2SeqModel(c.option, c.const, mode='train')
+  latencies = []
+  source_tokens = 0
+  target_tokens = 0
+  with tf.Session(config=session_config(c.option)) as sess:
+    sess.run(tf.global_variables_initializer())
+    for i in range(warmup + steps):
+      batch_data = batches[i % len(batches)]
+      feed_dict = model.feed(batch_data)
+      start = time.perf_counter()
+      sess.run(fetches=[model.train_op, model.loss], feed_dict=feed_dict)
+      if i < warmup:
+        continue
+      latencies.append(time.perf_counter() - start)
+      source_tokens += int(batch_data['encoder_lengths'].sum())
+      target_tokens += int(batch_data['decoder_lengths'].sum())
+
+  elapsed = sum(latencies)
+  return {'config': config,
+          'steps': steps,
+          'batch_size': batch_size,
+          'max_time': max_time,
+          'source_tokens_per_sec': source_tokens / elapsed,
+          'target_tokens_per_sec': target_tokens / elapsed,
+          'steps_per_sec': steps / elapsed,
+          'latency_ms': dict(('p%d' % q, float(np.percentile(latencies, q)) * 1000) for q in (50, 90, 99)),
+          'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+def main(args):
+  results = []
+  context = multiprocessing.get_context('spawn')
+  for config in args.config or CONFIGS:
+    with context.Pool(1) as pool:
+      result = pool.apply(benchmark, (config, args.steps, args.warmup, args.batch_size))
+    print('%s: %.1f target tokens/sec, p50 %.1f ms' % (
+        config, result['target_tokens_per_sec'], result['latency_ms']['p50']), file=sys.stderr)
+    results.append(result)
+
+  report = json.dumps(results, indent=2)
+  if args.output is None:
+    print(report)
+  else:
+    with open(args.output, 'w') as f:
+      f.write(report + '\n')
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--config', '-c', type=str, action='append', help='config file path, repeatable (default all NMT configs)')
+  parser.add_argument('--steps', '-s', type=int, default=100, help='number of measured steps')
+  parser.add_argument('--warmup', '-w', type=int, default=10, help='number of unmeasured steps before measuring')
+  parser.add_argument('--batch_size', '-b', type=int, default=None, help='override batch_size of configs')
+  parser.add_argument('--output', '-o', type=str, default=None, help='JSON output path (default stdout)')
+  args = parser.parse_args()
+  main(args)
@@ -1,10 +1,74 @@
 import configparser
+import copy
 import os
 import re
 
+OVERRIDES_ENV = 'TENSOROFLOW_OVERRIDES' # i.e. 'option.hidden_units=128;option.layers=2'
+BOOLEANS = {'true': True, 'false': False, 'yes': True, 'no': False, 'on': True, 'off': False}
+INT_PATTERN = re.compile(r'^[+-]?\d+$')
+FLOAT_PATTERN = re.compile(r'^[+-]?(\d+\.\d*|\.\d+|\d+)([eE][+-]?\d+)?$')
+
+_cache = dict() # (path, mtime) -> {section: {attribute: value}}
+
+def coerce(value: str):
+  """Typed value of a config string, the first rule matching wins:
+    contains ','                 => list of typed items, i.e. '5,10,20-25' => [5, 10, '20-25']
+    digits with optional sign    => int
+    decimal or exponent notation => float, i.e. '0.001', '1e-4'
+    true/false, yes/no, on/off   => bool (case insensitive)
+    otherwise                    => str, i.e. 'luong'
+  """
+  value = value.strip()
+  if ',' in value:
+    return [coerce(v) for v in value.split(',') if v.strip() != '']
+  if INT_PATTERN.match(value):
+    return int(value)
+  if FLOAT_PATTERN.match(value):
+    return float(value)
+  if value.lower() in BOOLEANS:
+    return BOOLEANS[value.lower()]
+  return value
+
+def parse_file(config_file: str) -> dict:
+  """Sections of a config file with typed values, parsed once per file modification."""
+  path = os.path.abspath(config_file)
+  key = (path, os.stat(path).st_mtime_ns)
+  if not key in _cache:
+    config_parser = configparser.ConfigParser(interpolation=None)
+    config_parser.optionxform = str # keep case, i.e. const BOS
+    with open(path, encoding='UTF-8') as f:
+      config_parser.read_file(f)
+    _cache[key] = dict((section, dict((k, coerce(v)) for k, v in config_parser.items(section)))
+                       for section in config_parser.sections())
+  return copy.deepcopy(_cache[key])
+
+def coerce_like(value: str, like=None):
+  """Typed value of an override string by the type of the value it replaces, by coerce if none."""
+  if like is None:
+    return coerce(value)
+  value = value.strip()
+  if isinstance(like, bool):
+    if not value.lower() in BOOLEANS:
+      raise ValueError('%s is not a bool, use one of %s' % (value, list(BOOLEANS)))
+    return BOOLEANS[value.lower()]
+  if isinstance(like, list):
+    return [coerce(v) for v in value.split(',') if v.strip() != '']
+  return type(like)(value) # int, float or str, raises ValueError if not convertible
+
+def parse_overrides(overrides) -> list:
+  """[(section, attribute, value string)] from 'section.attribute=value' strings."""
+  parsed = []
+  for override in overrides:
+    name, separator, value = override.partition('=')
+    section, dot, attribute = name.strip().partition('.')
+    if separator == '' or dot == '' or attribute == '':
+      raise ValueError('override should be section.attribute=value: %s' % override)
+    parsed.append((section, attribute, value))
+  return parsed
+
 class Configs(object):
 
-  def __init__(self, config_file):
+  def __init__(self, config_file, overrides=()):
     """
     How to add sections and attributes:
     1. define member, i.e. self.option = dict()
@@ -23,57 +87,38 @@ class Configs(object):
     4. write section and filepath in all config files. i.e.
        [common]
        const : configs/const.ini
+
+    Values are int, float, bool, list (comma separated) or str, see coerce.
+    Each file is parsed once per process until it is modified. overrides are
+    'section.attribute=value' strings applied after the environment variable
+    TENSOROFLOW_OVERRIDES (';' separated), i.e. from command line:
+      Configs(args.config, overrides=['option.hidden_units=128'])
+    An override takes the type of the value it replaces, see coerce_like.
     """
     ROOT = os.environ['TENSOROFLOW']
     self.option = dict()
     self.data = dict()
     self.const = dict()
-    
-    sections, attributes = self.get_attr(config_file)
+
+    sections = parse_file(config_file)
     section_pairs = {'option': self.option,
                      'data': self.data}
-    for k, v in zip(section_pairs.keys(), section_pairs.values()):
-      if k in sections:
-        self.read_config(config_file, v, k, attributes[k])
+    for k, v in section_pairs.items():
+      v.update(sections.get(k, {}))
 
     # common config file
-    config_parser = configparser.ConfigParser()
-    config_parser.read(config_file, 'UTF-8')
-    
     common_section_pairs = {'const': self.const}
-    for k, v in zip(common_section_pairs.keys(), common_section_pairs.values()):
-      common_file = '{}/{}'.format(ROOT, config_parser.get('common', k))
-      common_sections, common_attributes = self.get_attr(common_file)
-      self.read_config(common_file, v, k, common_attributes[k])
-
-  def read_config(self, config_file, section, section_name, attr):
-    config_parser = configparser.ConfigParser()
-    config_parser.read(config_file, 'UTF-8')
-    for a in attr:
-      buf = config_parser.get(section_name, a)
-      section[a] = buf if not str.isdigit(buf) else int(buf)
-
-  def get_attr(self, config_file):
-    with open(config_file, 'r') as f:
-      config_lines = f.readlines()
-    sections = []
-    current_section = ''
-    attributes = dict()
-    for n, config_line in enumerate(config_lines):
-      config_line = config_line.strip()
-      if not re.match('^\[.*]$', config_line) is None:
-        section = config_line.strip('[').strip(']')
-        sections.append(section)
-        current_section = section
-      else:
-        attribute = config_line.split(':')[0].strip()
-        if attribute == '':
-          continue
-        if not current_section in attributes.keys():
-          attributes[current_section] = list()
-        attributes[current_section].append(attribute)
-    return sections, attributes
+    for k, v in common_section_pairs.items():
+      common_file = '{}/{}'.format(ROOT, sections['common'][k])
+      v.update(parse_file(common_file).get(k, {}))
 
+    env_overrides = [o for o in os.environ.get(OVERRIDES_ENV, '').split(';') if o.strip() != '']
+    pairs = dict(section_pairs, **common_section_pairs)
+    for section, attribute, value in parse_overrides(env_overrides + list(overrides)):
+      if not section in pairs:
+        raise ValueError('unknown section %s in override %s.%s, sections are %s'
+                         % (section, section, attribute, ', '.join(sorted(pairs))))
+      pairs[section][attribute] = coerce_like(value, pairs[section].get(attribute))
 
   def old_init(self, config_file):
     config_parser = configparser.ConfigParser()
@@ -101,6 +146,3 @@ class Configs(object):
       buf = config_parser.get('option', a)
       option[a] = buf if not str.isdigit(buf) else int(buf)
     self.option = option
-
-
-
@@ -0,0 +1,131 @@
+import collections
+import heapq
+import re
+
+from typing import Iterable, List, Tuple
+
+CONTINUATION = '@@' # suffix of subwords followed by another subword of the same word
+CONTINUATION_PATTERN = re.compile(re.escape(CONTINUATION) + '( |$)', re.MULTILINE)
+
+
+class BPE(object):
+  """Byte pair encoding subword segmentation.
+
+  Examples:
+    bpe = BPE.learn(iter_words('datasets/kftt/kyoto-train.tk.en'), num_merges=8000)
+    bpe.save('examples/model/buf/bpe.en')
+    bpe.encode('lower newest')   # => ['low@@', 'er', 'new@@', 'est']
+    bpe.decode(['low@@', 'er'])  # => 'lower'
+
+  Subword sequences plug into the word level pipeline:
+    build_dictionary(bpe.segment(iter_words(path)), vocabulary_size)
+    sentence_to_onehot(line, dictionary, tokenize=bpe.encode)
+  """
+
+  def __init__(self, merges: List[Tuple[str, str]], cache_size=100000):
+    self.merges = merges
+    self.ranks = dict((pair, rank) for rank, pair in enumerate(merges))
+    self.cache = dict() # word -> subwords
+    self.cache_size = cache_size
+
+  @classmethod
+  def learn(cls, words: Iterable[str], num_merges: int, min_frequency=2):
+    """Learn merges from words, a stream of tokens."""
+    vocab = [(tuple(word[:-1]) + (word[-1] + '</w>',), count)
+             for word, count in collections.Counter(words).items() if word]
+    symbols = [list(word) for word, _ in vocab]
+    counts = [count for _, count in vocab]
+
+    # pair statistics and pair -> indices of words containing the pair
+    stats = collections.Counter()
+    index = collections.defaultdict(set)
+    for i, word in enumerate(symbols):
+      for pair in zip(word[:-1], word[1:]):
+        stats[pair] += counts[i]
+        index[pair].add(i)
+
+    heap = [(-frequency, pair) for pair, frequency in stats.items()]
+    heapq.heapify(heap)
+    merges = []
+    while len(merges) < num_merges and heap:
+      frequency, pair = heapq.heappop(heap)
+      if -frequency != stats[pair]: # outdated entry
+        if stats[pair] > 0:
+          heapq.heappush(heap, (-stats[pair], pair))
+        continue
+      if -frequency < min_frequency:
+        break
+      merges.append(pair)
+      merged = pair[0] + pair[1]
+      changed = set()
+      for i in index.pop(pair):
+        word = symbols[i]
+        for old in zip(word[:-1], word[1:]):
+          stats[old] -= counts[i]
+        word = _merge_pair(word, pair, merged)
+        symbols[i] = word
+        for new in zip(word[:-1], word[1:]):
+          stats[new] += counts[i]
+          index[new].add(i)
+          changed.add(new)
+      del stats[pair]
+      for new in changed:
+        heapq.heappush(heap, (-stats[new], new))
+    return cls(merges)
+
+  def encode_word(self, word: str) -> List[str]:
+    if word in self.cache:
+      return self.cache[word]
+    symbols = list(word[:-1]) + [word[-1] + '</w>']
+    while len(symbols) > 1:
+      pairs = zip(symbols[:-1], symbols[1:])
+      pair = min(pairs, key=lambda p: self.ranks.get(p, len(self.ranks)))
+      if not pair in self.ranks:
+        break
+      symbols = _merge_pair(symbols, pair, pair[0] + pair[1])
+    subwords = [s + CONTINUATION for s in symbols[:-1]] + [symbols[-1][:-len('</w>')]]
+    if len(self.cache) >= self.cache_size:
+      self.cache.clear()
+    self.cache[word] = subwords
+    return subwords
+
+  def encode(self, sentence: str) -> List[str]:
+    subwords = []
+    for word in sentence.strip().split():
+      subwords.extend(self.encode_word(word))
+    return subwords
+
+  def segment(self, words: Iterable[str]) -> Iterable[str]:
+    for word in words:
+      yield from self.encode_word(word)
+
+  def decode(self, subwords: Iterable[str]) -> str:
+    return self.restore(' '.join(subwords))
+
+  def restore(self, text: str) -> str:
+    """Join subwords of space separated (possibly multi-line) text into words."""
+    return CONTINUATION_PATTERN.sub('', text)
+
+  def save(self, path: str):
+    with open(path, 'w') as f:
+      for a, b in self.merges:
+        f.write('{} {}\n'.format(a, b))
+
+  @classmethod
+  def load(cls, path: str):
+    with open(path) as f:
+      merges = [tuple(line.split()) for line in f if line.strip()]
+    return cls(merges)
+
+
+def _merge_pair(symbols: List[str], pair: Tuple[str, str], merged: str) -> List[str]:
+  new_symbols = []
+  i = 0
+  while i < len(symbols):
+    if i < len(symbols) - 1 and symbols[i] == pair[0] and symbols[i + 1] == pair[1]:
+      new_symbols.append(merged)
+      i += 2
+    else:
+      new_symbols.append(symbols[i])
+      i += 1
+  return new_symbols
@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+
+from typing import Iterator, List, Tuple
+import numpy as np
+
+from data.data import sentence_to_onehot
+
+_dictionary = None # dictionary shared with encoder worker processes
+_tokenize = None
+
+
+def file_shards(input_file: str, num_shards: int) -> List[Tuple[int, int]]:
+  """Split a file into byte ranges which start at the beginning of a line.
+
+  Examples:
+    shards = file_shards('datasets/kftt/kyoto-train.tk.en', 4)
+    # => [(0, 1032), (1032, 2070), (2070, 3101), (3101, 4127)]
+  """
+  size = os.path.getsize(input_file)
+  if size == 0:
+    return []
+  num_shards = max(1, min(num_shards, size))
+  bounds = [0]
+  with open(input_file, 'rb') as f:
+    for i in range(1, num_shards):
+      f.seek(size * i // num_shards - 1)
+      f.readline() # move to the head of next line
+      bound = f.tell()
+      if bounds[-1] < bound < size:
+        bounds.append(bound)
+  bounds.append(size)
+  return list(zip(bounds[:-1], bounds[1:]))
+
+def read_shard(input_file: str, start: int, end: int) -> Iterator[str]:
+  """Yield lines of a shard given by file_shards."""
+  with open(input_file, 'rb') as f:
+    f.seek(start)
+    position = start
+    while position < end:
+      line = f.readline()
+      if not line:
+        break
+      position += len(line)
+      yield line.decode('utf-8')
+
+def read_shard_words(input_file: str, start: int, end: int, tokenize=None) -> Iterator[str]:
+  for line in read_shard(input_file, start, end):
+    yield from line.split() if tokenize is None else tokenize(line)
+
+def _init_encoder(dictionary: dict, tokenize=None):
+  global _dictionary, _tokenize
+  _dictionary = dictionary
+  _tokenize = tokenize
+
+def _encode_shard(args):
+  input_file, start, end = args
+  ids = []
+  lengths = []
+  for line in read_shard(input_file, start, end):
+    onehots = sentence_to_onehot(line, _dictionary, _tokenize)
+    ids.extend(onehots)
+    lengths.append(len(onehots))
+  return np.array(ids, dtype=np.int32), np.array(lengths, dtype=np.int64)
+
+def encode_file_to_array(input_file: str, dictionary: dict, processes=1, tokenize=None):
+  """Encode every line of a file into one contiguous id array.
+
+  Examples:
+    ids, offsets = encode_file_to_array('datasets/kftt/kyoto-train.tk.en', dictionary, processes=4)
+    ids[offsets[i]:offsets[i + 1]] # ids of i-th line
+
+  The file is split into byte range shards encoded by a process pool.
+  """
+  processes = processes or multiprocessing.cpu_count()
+  shards = [(input_file, start, end) for start, end in file_shards(input_file, processes)]
+  if processes == 1:
+    _init_encoder(dictionary, tokenize)
+    results = [_encode_shard(shard) for shard in shards]
+    _init_encoder(None)
+  else:
+    with multiprocessing.Pool(processes, initializer=_init_encoder, initargs=(dictionary, tokenize)) as pool:
+      results = pool.map(_encode_shard, shards)
+  ids = np.concatenate([np.zeros(0, dtype=np.int32)] + [r[0] for r in results])
+  lengths = np.concatenate([np.zeros(0, dtype=np.int64)] + [r[1] for r in results])
+  offsets = np.concatenate([[0], np.cumsum(lengths)])
+  return ids, offsets
+
+def encode_file(input_file: str, dictionary: dict, processes=1, tokenize=None) -> List[np.ndarray]:
+  """Parallel version of [sentence_to_onehot(line, dictionary) for line in read_data(input_file)].
+
+  Returned sentences are views of one contiguous id array.
+  """
+  ids, offsets = encode_file_to_array(input_file, dictionary, processes, tokenize)
+  if len(offsets) == 1:
+    return []
+  return np.split(ids, offsets[1:-1])
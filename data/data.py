@@ -1,7 +1,10 @@
 import collections
+import collections.abc
+import mmap
 import os
+import struct
 
-from typing import List, Sequence, TypeVar
+from typing import Callable, Iterator, List, Sequence, Tuple, TypeVar
 import numpy as np
 
 from configs.configs import Configs 
@@ -15,6 +18,9 @@ EOS = c.const['EOS']
 BOS = c.const['BOS']
 UNK = c.const['UNK']
 END_TOKEN = c.const['END_TOKEN']
+RESERVED_WORDS = ['PAD', 'EOS', 'BOS', 'UNK'] # ordered by their token ids
+VOCABULARY_MAGIC = b'TOFV'
+VOCABULARY_HEADER = struct.Struct('<4sIQ') # magic, version, number of words
 A = TypeVar('A')
 
 def read_words(input_file: str) -> List[str]:
@@ -23,36 +29,188 @@ def read_words(input_file: str) -> List[str]:
     words += f.read().split()
   return words
 
+def iter_words(input_file: str) -> Iterator[str]:
+  """Streaming version of read_words, it holds only one line in memory."""
+  with open(input_file) as f:
+    for line in f:
+      yield from line.split()
+
 def read_data(input_file: str) -> List[List[str]]:
   with open(input_file) as f:
     lines = f.readlines()  
   return lines
 
-def sentence_to_onehot(sentence: str, dictionary: dict) -> List[int]:
+def sentence_to_onehot(sentence: str, dictionary: dict, tokenize: Callable[[str], List[str]]=None) -> List[int]:
+  """tokenize splits sentence into words, i.e. BPE.encode, default is whitespace split."""
+  words = sentence.strip().split() if tokenize is None else tokenize(sentence)
   onehots = []
-  for word in sentence.strip().split():
-    onehot = dictionary[word] if word in dictionary.keys() else UNK
-    onehots.append(onehot)
+  for word in words:
+    onehots.append(dictionary.get(word, UNK))
   return onehots
 
-def build_dictionary(words, vocabulary_size):
-  """Process raw inputs into a dataset."""
-  count = [['PAD', -1], ['EOS', -1], ['BOS', -1], ['UNK', -1]] # reserved
-  count.extend(collections.Counter(words).most_common(vocabulary_size - len(count)))
+def make_dictionary(most_common: Sequence[Tuple[str, int]]):
+  """Make dictionary and reversed dictionary from (word, count) pairs sorted by count."""
+  count = [[word, -1] for word in RESERVED_WORDS] # reserved
+  count.extend(most_common)
   dictionary = dict()
   for word, _ in count:
     dictionary[word] = len(dictionary)
-  data = list()
-  unk_count = 0
-  for word in words:
-    index = dictionary.get(word, 0)
-    if index == 0:  # dictionary['UNK']
-      unk_count += 1
-    data.append(index)
-  count[UNK][1] = unk_count
   reversed_dictionary = dict(zip(dictionary.values(), dictionary.keys()))
   return dictionary, reversed_dictionary
 
+def build_dictionary(words, vocabulary_size):
+  """Process raw inputs into a dataset."""
+  most_common = collections.Counter(words).most_common(vocabulary_size - len(RESERVED_WORDS))
+  return make_dictionary(most_common)
+
+def save_dictionary(path: str, dictionary: dict):
+  """Save dictionary as one compact vocabulary file, load it with load_dictionary.
+
+  Layout (little endian):
+    header  : magic 'TOFV', version (uint32), number of words n (uint64)
+    ids     : int32[n], id of each word in sorted order
+    offsets : uint64[n + 1], offsets of each word in the string table
+    strings : utf-8 words sorted by bytes
+  """
+  items = sorted((word.encode('utf-8'), index) for word, index in dictionary.items())
+  ids = np.array([index for _, index in items], dtype='<i4')
+  offsets = np.zeros(len(items) + 1, dtype='<u8')
+  offsets[1:] = np.cumsum([len(word) for word, _ in items])
+  with open(path, 'wb') as f:
+    f.write(VOCABULARY_HEADER.pack(VOCABULARY_MAGIC, 1, len(items)))
+    f.write(ids.tobytes())
+    f.write(offsets.tobytes())
+    f.write(b''.join(word for word, _ in items))
+
+def load_dictionary(path: str):
+  """Load dictionary and reversed dictionary saved by save_dictionary.
+
+  Examples:
+    dictionary, reversed_dictionary = load_dictionary('examples/model/buf/source.vocab')
+    dictionary['the'] # => 4
+    reversed_dictionary[4] # => 'the'
+
+  Both are read-only mappings over a memory-mapped file, so loading is O(1)
+  in the vocabulary size except for deriving the id -> word position array.
+  The word -> id dict used by lookups is built on the first lookup.
+  """
+  vocabulary = Vocabulary(path)
+  return vocabulary, vocabulary.reverse
+
+
+class Vocabulary(collections.abc.Mapping):
+  """Memory-mapped word -> id mapping of a file written by save_dictionary."""
+
+  def __init__(self, path: str):
+    self.path = path
+    with open(path, 'rb') as f:
+      self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, n = VOCABULARY_HEADER.unpack_from(self.buffer)
+    if magic != VOCABULARY_MAGIC or version != 1:
+      raise ValueError('%s is not a vocabulary file' % path)
+    position = VOCABULARY_HEADER.size
+    self.ids = np.frombuffer(self.buffer, dtype='<i4', count=n, offset=position)
+    position += self.ids.nbytes
+    self.offsets = np.frombuffer(self.buffer, dtype='<u8', count=n + 1, offset=position)
+    self.strings = position + self.offsets.nbytes # head of string table
+    self.reverse = ReversedVocabulary(self)
+    self._words = None
+    self._index = None
+
+  def __reduce__(self):
+    return (Vocabulary, (self.path,))
+
+  def word_at(self, position: int) -> bytes:
+    start = self.strings + int(self.offsets[position])
+    end = self.strings + int(self.offsets[position + 1])
+    return self.buffer[start:end]
+
+  def __getitem__(self, word: str) -> int:
+    return self.index[word]
+
+  def get(self, word: str, default=None):
+    return self.index.get(word, default)
+
+  def __contains__(self, word) -> bool:
+    return word in self.index
+
+  def __iter__(self) -> Iterator[str]:
+    for position in range(len(self.ids)):
+      yield self.word_at(position).decode('utf-8')
+
+  def __len__(self) -> int:
+    return len(self.ids)
+
+  @property
+  def index(self) -> dict:
+    """word -> id dict, built on first use so that bulk encoding runs at dict speed."""
+    if self._index is None:
+      self._index = dict(zip(self, self.ids.tolist()))
+    return self._index
+
+  @property
+  def words(self) -> np.ndarray:
+    """Array of words indexed by id ('' for unused ids), built on first use."""
+    if self._words is None:
+      words = np.full(self.reverse.positions.shape, '', dtype=object)
+      words[self.ids] = list(self)
+      self._words = words
+    return self._words
+
+
+class ReversedVocabulary(collections.abc.Mapping):
+  """id -> word view of a Vocabulary."""
+
+  def __init__(self, vocabulary: Vocabulary):
+    self.vocabulary = vocabulary
+    ids = vocabulary.ids
+    self.positions = np.full(int(ids.max()) + 1 if len(ids) > 0 else 0, -1, dtype=np.int64)
+    self.positions[ids] = np.arange(len(ids))
+
+  def __getitem__(self, index: int) -> str:
+    if not 0 <= index < len(self.positions) or self.positions[index] < 0:
+      raise KeyError(index)
+    return self.vocabulary.word_at(self.positions[index]).decode('utf-8')
+
+  def __iter__(self) -> Iterator[int]:
+    return iter(np.sort(self.vocabulary.ids).tolist())
+
+  def __len__(self) -> int:
+    return len(self.vocabulary)
+
+
+def reversed_dictionary_to_array(reversed_dictionary) -> np.ndarray:
+  """Array of words indexed by id, the array-backed form used by detokenize."""
+  if isinstance(reversed_dictionary, ReversedVocabulary):
+    return reversed_dictionary.vocabulary.words
+  words = np.full(max(reversed_dictionary.keys()) + 1, '', dtype=object)
+  words[list(reversed_dictionary.keys())] = list(reversed_dictionary.values())
+  return words
+
+def detokenize(ids: np.ndarray, words: np.ndarray, eos=EOS, lengths=None) -> List[str]:
+  """Convert rows of ids into sentences, each row is cut at its first eos.
+
+  Examples:
+    words = reversed_dictionary_to_array(target_reverse_dictionary)
+    sentences = detokenize(predict_vectors, words) # predict_vectors: [batch, time]
+
+  If lengths is given, rows are cut at lengths instead of eos.
+  """
+  ids = np.asarray(ids)
+  if ids.shape[1] == 0:
+    return [''] * ids.shape[0]
+  if lengths is None:
+    is_eos = ids == eos
+    lengths = np.where(is_eos.any(axis=1), is_eos.argmax(axis=1), ids.shape[1])
+  valid = np.arange(ids.shape[1]) < np.asarray(lengths)[:, np.newaxis]
+  words = np.asarray(words, dtype=object)
+  tokens = np.empty((ids.shape[0], ids.shape[1] + 1), dtype=object)
+  tokens[:, :-1] = np.char.add(' ', words.astype(str)).astype(object)[ids] # ' word'
+  tokens[:, 0] = words[ids[:, 0]] # first word has no leading space
+  tokens[:, :-1][~valid] = ''
+  tokens[:, -1] = '\n'
+  return ''.join(tokens.ravel().tolist()).split('\n')[:-1]
+
 def simple_data(max_time: int, vocabulary_size: int) -> Sequence[int]:
   """
   Examples:
@@ -88,7 +246,9 @@ def through(datas: List[List[int]], max_time: int, batch_size: int, vocabulary_s
   decoder_labels = [padding(np.concatenate([data, [EOS]]), decoder_max_time) for data in datas]
   res = {'encoder_inputs': np.array(encoder_inputs).T, 
          'decoder_inputs': np.array(decoder_inputs).T, 
-         'decoder_labels': np.array(decoder_labels).T}
+         'decoder_labels': np.array(decoder_labels).T,
+         'encoder_lengths': np.array([max(min(len(data), max_time), 1) for data in datas]),
+         'decoder_lengths': np.array([min(len(data) + 1, decoder_max_time) for data in datas])}
   return res
 
 def batchnize(data: Sequence[A], batch_size: int, batch_idx: int) -> Sequence[A]:
@@ -101,8 +261,16 @@ def batchnize(data: Sequence[A], batch_size: int, batch_idx: int) -> Sequence[A]
 def seq2seq(source_datas: List[List[int]], target_datas: List[List[int]], max_time: int, vocabulary_size: int, use_BOS=True, decoder_time_append=False, reverse=False) -> dict:
   """
   Examples:
+    batch_data = seq2seq(source_batch, target_batch, max_time=64, vocabulary_size=40000, reverse=True)
+
+  encoder_lengths and decoder_lengths are the number of valid (non padding)
+  steps of each sentence, decoder_lengths counts decoder_labels incl. EOS.
+  reverse reverses each source sentence within its length, padding stays at the end.
   """
   decoder_max_time = max_time + 1 if decoder_time_append else max_time
+  source_lengths = [len(data) if not use_BOS else len(data) + 1 for data in source_datas]
+  encoder_lengths = np.array([max(min(length, max_time), 1) for length in source_lengths])
+  decoder_lengths = np.array([min(len(data) + 1, decoder_max_time) for data in target_datas])
 
   if not use_BOS:
     encoder_inputs = [padding(data, max_time) for data in source_datas]
@@ -114,9 +282,12 @@ def seq2seq(source_datas: List[List[int]], target_datas: List[List[int]], max_ti
     decoder_labels = [padding(np.concatenate([data, [EOS]]), decoder_max_time, pad=EOS) for data in target_datas]
 
   if reverse:
-    encoder_inputs = np.fliplr(encoder_inputs)
+    encoder_inputs = [np.concatenate([vector[:length][::-1], vector[length:]])
+                      for vector, length in zip(encoder_inputs, encoder_lengths)]
 
   res = {'encoder_inputs': np.array(encoder_inputs).T, 
          'decoder_inputs': np.array(decoder_inputs).T, 
-         'decoder_labels': np.array(decoder_labels).T}
+         'decoder_labels': np.array(decoder_labels).T,
+         'encoder_lengths': encoder_lengths,
+         'decoder_lengths': decoder_lengths}
   return res
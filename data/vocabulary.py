@@ -0,0 +1,96 @@
+import collections
+import itertools
+import multiprocessing
+
+from typing import Iterable, List, Tuple
+
+from data.corpus import file_shards, read_shard_words
+from data.data import RESERVED_WORDS, make_dictionary
+
+
+class VocabularyBuilder(object):
+  """Count word frequencies from token streams without holding the corpus.
+
+  Examples:
+    builder = VocabularyBuilder(vocabulary_size=40000, min_count=2)
+    for path in paths:
+      builder.update(iter_words(path))
+    dictionary, reversed_dictionary = builder.build()
+
+  If capacity is given, the builder keeps at most 2 * capacity counters and
+  prunes them with the Misra-Gries summary, so counts become lower bounds
+  of the true counts (the gap is at most self.error). Every word appearing
+  more than n / (capacity + 1) times in n tokens is guaranteed to be kept.
+  """
+
+  def __init__(self, vocabulary_size: int, min_count=1, capacity=None,
+               chunk_size=100000):
+    self.vocabulary_size = vocabulary_size
+    self.min_count = min_count # words appearing less than this are UNK
+    self.capacity = capacity # number of counters kept after pruning, None is exact
+    self.chunk_size = chunk_size # number of tokens counted at once
+    self.counter = collections.Counter()
+    self.error = 0 # upper bound of count underestimation by pruning
+
+  def update(self, words: Iterable[str]):
+    words = iter(words)
+    while True:
+      chunk = list(itertools.islice(words, self.chunk_size))
+      if chunk == []:
+        return self
+      self.counter.update(chunk)
+      self.prune()
+
+  def merge(self, other):
+    self.counter.update(other.counter)
+    self.error += other.error
+    self.prune()
+    return self
+
+  def prune(self):
+    if self.capacity is None or len(self.counter) <= 2 * self.capacity:
+      return
+    kept = self.counter.most_common(self.capacity + 1)
+    floor = kept[-1][1]
+    self.counter = collections.Counter({word: count - floor for word, count in kept[:-1]
+                                        if count > floor})
+    self.error += floor
+
+  def most_common(self) -> List[Tuple[str, int]]:
+    most_common = self.counter.most_common(self.vocabulary_size - len(RESERVED_WORDS))
+    return [(word, count) for word, count in most_common if count >= self.min_count]
+
+  def build(self):
+    """Same output as data.data.build_dictionary."""
+    return make_dictionary(self.most_common())
+
+
+def _count_shard(args) -> VocabularyBuilder:
+  input_file, start, end, vocabulary_size, min_count, capacity, tokenize = args
+  builder = VocabularyBuilder(vocabulary_size, min_count, capacity)
+  return builder.update(read_shard_words(input_file, start, end, tokenize))
+
+def build_dictionary_from_files(input_files: List[str], vocabulary_size: int,
+                                min_count=1, capacity=None, processes=1, tokenize=None):
+  """Streaming version of build_dictionary(read_words(...)) over several files.
+
+  Examples:
+    dictionary, reversed_dictionary = build_dictionary_from_files(
+        ['datasets/kftt/kyoto-train.tk.en'], vocabulary_size=40000, processes=4)
+
+  Each file is split into processes shards, and shard counts are merged.
+  tokenize splits a line into words, i.e. BPE.encode, default is whitespace split.
+  """
+  processes = processes or multiprocessing.cpu_count()
+  shards = [(input_file, start, end, vocabulary_size, min_count, capacity, tokenize)
+            for input_file in input_files
+            for start, end in file_shards(input_file, processes)]
+  builder = VocabularyBuilder(vocabulary_size, min_count, capacity)
+  if processes == 1:
+    for shard in shards:
+      builder.merge(_count_shard(shard))
+  else:
+    with multiprocessing.Pool(processes) as pool:
+      for shard_builder in pool.imap(_count_shard, shards):
+        builder.merge(shard_builder)
+  return builder.build()
@@ -0,0 +1,49 @@
+# coding: utf-8
+#
+# Usage:
+#   python examples/plot_metrics.py examples/model/attention_nmt/metrics.csv
+#   python examples/plot_metrics.py examples/model/attention_nmt/metrics.csv -n train_loss -n valid_loss -o loss.png
+#
+# Purpose:
+#   Plot scalars written by utils.metrics.Metrics, one figure per scalar unless names are given.
+
+import argparse
+import os
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from utils.metrics import read_metrics
+
+
+def main(args):
+  series = read_metrics(args.metrics)
+  if args.name:
+    plt.figure()
+    for name in args.name:
+      steps, values = series[name]
+      plt.plot(steps, values, label=name)
+    plt.xlabel('step')
+    plt.legend()
+    output = args.output or '%s.png' % os.path.splitext(args.metrics)[0]
+    plt.savefig(output)
+    print('save at %s' % output)
+    return
+
+  for name, (steps, values) in series.items():
+    plt.figure()
+    plt.plot(steps, values)
+    plt.xlabel('step')
+    plt.ylabel(name)
+    output = '%s_%s.png' % (os.path.splitext(args.output or args.metrics)[0], name)
+    plt.savefig(output)
+    print('save at %s' % output)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('metrics', type=str, help='metrics CSV path')
+  parser.add_argument('--name', '-n', type=str, action='append', help='scalar names drawn in one figure, repeatable')
+  parser.add_argument('--output', '-o', type=str, default=None, help='output image path (prefix without --name)')
+  args = parser.parse_args()
+  main(args)
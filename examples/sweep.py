@@ -0,0 +1,142 @@
+# coding: utf-8
+#
+# Usage:
+#   python examples/sweep.py -e examples/attention_nmt.py -c configs/attention_nmt.ini \
+#     -g hidden_units=64,128 -g layers=1,2 -w 4
+#
+# Purpose:
+#   Train every combination of [option] values given by -g concurrently.
+#   Each run gets a slice of CPU cores and the same number of session threads,
+#   and final metrics of all runs are collected into one table.
+
+import argparse
+import configparser
+import csv
+import itertools
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from utils.metrics import read_metrics
+from utils.run_directory import latest_run_directory
+
+
+def expand_grid(grid: list) -> list:
+  """[('layers', ['1', '2']), ...] => [{'layers': '1', ...}, {'layers': '2', ...}, ...]"""
+  keys = [key for key, _ in grid]
+  return [dict(zip(keys, values)) for values in itertools.product(*[values for _, values in grid])]
+
+def run_name(options: dict) -> str:
+  return '_'.join('%s-%s' % (k, v) for k, v in options.items())
+
+def write_config(base_config: str, path: str, options: dict):
+  """Copy base_config with options replaced in [option] section, in 'key : value' format read by Configs."""
+  parser = configparser.ConfigParser()
+  parser.optionxform = str # keep case of keys
+  parser.read(base_config, 'UTF-8')
+  for k, v in options.items():
+    parser.set('option', k, str(v))
+  with open(path, 'w') as f:
+    for section in parser.sections():
+      f.write('[%s]\n' % section)
+      for k, v in parser.items(section):
+        f.write('%s : %s\n' % (k, v))
+      f.write('\n')
+
+def core_slices(workers: int) -> list:
+  cores = sorted(os.sched_getaffinity(0))
+  size = max(1, len(cores) // workers)
+  return [cores[i * size:(i + 1) * size] or cores for i in range(workers)]
+
+def launch(args, run: dict, cores: list):
+  threads = str(len(cores))
+  env = dict(os.environ, OMP_NUM_THREADS=threads)
+  log = open('%s/%s.log' % (run['sweep_directory'], run['name']), 'w')
+  command = [sys.executable, args.entry, '-m', 'train', '-c', run['config']]
+  process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env,
+                             preexec_fn=lambda: os.sched_setaffinity(0, cores))
+  run.update(process=process, log=log, cores=cores, start=time.time())
+
+def summarize(run: dict) -> dict:
+  row = dict(run['options'])
+  row.update(name=run['name'], returncode=run['process'].returncode,
+             minutes='%.1f' % ((run['end'] - run['start']) / 60))
+  metrics_path = '%s/metrics.csv' % latest_run_directory(run['model_directory']) # versioned by the entry
+  if os.path.isfile(metrics_path):
+    series = read_metrics(metrics_path)
+    if 'valid_loss' in series:
+      steps, values = series['valid_loss']
+      row.update(best_valid_loss='%.4f' % values.min(), best_step=steps[values.argmin()])
+    if 'train_loss' in series:
+      row.update(final_train_loss='%.4f' % series['train_loss'][1][-1], steps=series['train_loss'][0][-1])
+    if 'tokens_per_sec' in series:
+      row.update(tokens_per_sec='%.0f' % np.mean(series['tokens_per_sec'][1]))
+  return row
+
+def main(args):
+  ROOT = os.environ['TENSOROFLOW']
+  sweep_directory = '%s/%s' % (ROOT, args.output)
+  os.makedirs('%s/configs' % sweep_directory, exist_ok=True)
+  grid = [(k, v.split(',')) for k, v in (g.split('=', 1) for g in args.grid)]
+
+  slices = core_slices(args.workers)
+  runs = []
+  for options in expand_grid(grid):
+    name = run_name(options)
+    options = dict(options,
+                   output='%s/%s' % (args.output, name),
+                   intra_op_threads=len(slices[0]),
+                   inter_op_threads=args.inter_op_threads)
+    config = '%s/configs/%s.ini' % (sweep_directory, name)
+    write_config(args.config, config, options)
+    runs.append({'name': name, 'options': dict((k, v) for k, v in options.items() if k in dict(grid)),
+                 'config': config, 'sweep_directory': sweep_directory,
+                 'model_directory': '%s/%s' % (ROOT, options['output'])})
+  print('%d runs on %d workers, cores per worker: %d' % (len(runs), args.workers, len(slices[0])))
+
+  pending = list(runs)
+  running = dict() # slot -> run
+  while pending or running:
+    for slot in range(args.workers):
+      if slot in running or not pending:
+        continue
+      run = pending.pop(0)
+      launch(args, run, slices[slot])
+      running[slot] = run
+      print('start %s on cores %s' % (run['name'], slices[slot]))
+    for slot, run in list(running.items()):
+      if run['process'].poll() is None:
+        continue
+      run['end'] = time.time()
+      run['log'].close()
+      del running[slot]
+      print('finish %s with code %d' % (run['name'], run['process'].returncode))
+    time.sleep(1)
+
+  rows = [summarize(run) for run in runs]
+  columns = []
+  for row in rows:
+    columns += [k for k in row.keys() if not k in columns]
+  results_path = '%s/results.csv' % sweep_directory
+  with open(results_path, 'w', newline='') as f:
+    writer = csv.DictWriter(f, fieldnames=columns)
+    writer.writeheader()
+    writer.writerows(rows)
+  print('\t'.join(columns))
+  for row in rows:
+    print('\t'.join(str(row.get(k, '')) for k in columns))
+  print('results at %s' % results_path)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--entry', '-e', type=str, help='training script, i.e. examples/attention_nmt.py')
+  parser.add_argument('--config', '-c', type=str, help='base config file path')
+  parser.add_argument('--grid', '-g', type=str, action='append', default=[], help='option=value1,value2,... repeatable')
+  parser.add_argument('--workers', '-w', type=int, default=2, help='number of concurrent runs')
+  parser.add_argument('--inter_op_threads', type=int, default=1, help='inter_op_threads of each run')
+  parser.add_argument('--output', '-o', type=str, default='examples/model/sweep', help='sweep directory under TENSOROFLOW')
+  args = parser.parse_args()
+  main(args)
@@ -0,0 +1,171 @@
+import glob
+import hashlib
+import os
+import pickle
+
+import numpy as np
+from tensorflow.contrib.framework import nest
+
+from utils.cache import LRUCache
+
+
+def source_key(encoder_inputs: np.ndarray, encoder_lengths: np.ndarray, index: int) -> bytes:
+  """Cache key of index-th source sentence of a time major batch."""
+  ids = encoder_inputs[:encoder_lengths[index], index]
+  return np.ascontiguousarray(ids, dtype=np.int32).tobytes()
+
+
+def select(batch_data: dict, indices: list) -> dict:
+  """Sub batch of an output of data.data.seq2seq."""
+  return dict((k, v[:, indices] if v.ndim == 2 else v[indices]) for k, v in batch_data.items())
+
+
+def model_fingerprint(model_path: str, option: dict, mode: str) -> str:
+  """Identify a trained model and its decode settings by options and checkpoint file stats.
+
+  Only checkpoint artifacts are hashed, outputs next to them such as
+  model.evaluate_predict are rewritten by every eval.
+  """
+  paths = glob.glob('%s.data-*' % model_path) + ['%s.index' % model_path, '%s.meta' % model_path,
+                                                 os.path.join(os.path.dirname(model_path), 'checkpoint')]
+  h = hashlib.sha1()
+  h.update(repr((mode, sorted(option.items()))).encode('utf-8'))
+  for path in sorted(path for path in paths if os.path.isfile(path)):
+    stat = os.stat(path)
+    h.update(repr((os.path.basename(path), stat.st_size, stat.st_mtime_ns)).encode('utf-8'))
+  return h.hexdigest()
+
+
+def decode(sess, model, batch_data: dict, max_time: int, encoder_cache=None, result_cache=None):
+  """Prediction ([max_time, batch_size], EOS padded) and summed loss of each sentence.
+
+  Examples:
+    pred, sentence_loss = decode(sess, model, batch_data, max_time, encoder_cache, result_cache)
+    loss_val.append(sentence_loss.sum() / batch_data['decoder_lengths'].sum())
+
+  Sentences found in result_cache skip the graph, the others are decoded as one sub batch.
+  A cached prediction whose reference is new only runs the teacher forced loss.
+  """
+  batch_size = batch_data['encoder_inputs'].shape[1]
+  preds = [None] * batch_size
+  losses = [None] * batch_size
+  if result_cache is not None:
+    teacher_forced = model.mode != 'infer' # prediction depends on the reference
+    keys = [result_cache.key(batch_data, i, teacher_forced) for i in range(batch_size)]
+    targets = [result_cache.target(batch_data, i) for i in range(batch_size)]
+    entries = [result_cache.get(key) for key in keys]
+    for i, entry in enumerate(entries):
+      if entry is not None:
+        preds[i] = entry[0]
+        losses[i] = entry[1].get(targets[i])
+
+  def run(fetches, indices):
+    missed_data = batch_data if len(indices) == batch_size else select(batch_data, indices)
+    if encoder_cache is None:
+      feed_dict = model.feed(missed_data)
+    else:
+      feed_dict = encoder_cache.feed(sess, missed_data)
+    return sess.run(fetches=fetches, feed_dict=feed_dict)
+
+  missed = [i for i, pred in enumerate(preds) if pred is None]
+  if missed:
+    pred, sentence_loss = run([model.prediction, model.sentence_loss], missed)
+    pred = np.pad(pred, ((0, max_time - len(pred)), (0, 0)), 'constant', constant_values=model.EOS)
+    for n, i in enumerate(missed):
+      preds[i] = pred[:, n].copy()
+      losses[i] = float(sentence_loss[n])
+      if result_cache is not None:
+        result_cache.put(keys[i], (preds[i], {targets[i]: losses[i]}))
+  loss_missed = [i for i, loss in enumerate(losses) if loss is None]
+  if loss_missed:
+    sentence_loss = run(model.sentence_loss, loss_missed)
+    for n, i in enumerate(loss_missed):
+      losses[i] = float(sentence_loss[n])
+      entry_losses = dict(entries[i][1])
+      entry_losses[targets[i]] = losses[i]
+      result_cache.put(keys[i], (preds[i], entry_losses))
+  return np.stack(preds, axis=1), np.array(losses)
+
+
+class ResultCache(LRUCache):
+  """Cache of (prediction, {target ids: sentence loss}) keyed by (model fingerprint, source ids).
+
+  Examples:
+    result_cache = ResultCache(model_fingerprint(model_path, c.option, mode), max_bytes, path)
+    pred, sentence_loss = decode(sess, model, batch_data, max_time, result_cache=result_cache)
+    result_cache.save()
+
+  If path is given, entries are loaded from and saved to the file. Entries of
+  other models never hit because the fingerprint is a part of keys. A repeated
+  source hits the prediction whatever its reference is, unless the prediction
+  is teacher forced (a train mode model), then target ids are a part of keys.
+  One lookup is done per sentence, so hits and misses count sentences.
+  """
+
+  def __init__(self, fingerprint: str, max_bytes: int, path=None):
+    super(ResultCache, self).__init__(max_bytes)
+    self.fingerprint = fingerprint
+    self.path = path
+    if path is not None and os.path.isfile(path):
+      with open(path, 'rb') as f:
+        for key, value in pickle.load(f):
+          self.put(key, value)
+
+  def key(self, batch_data: dict, index: int, with_target=False) -> tuple:
+    key = (self.fingerprint, source_key(batch_data['encoder_inputs'], batch_data['encoder_lengths'], index))
+    return key + (self.target(batch_data, index),) if with_target else key
+
+  def target(self, batch_data: dict, index: int) -> bytes:
+    return source_key(batch_data['decoder_labels'], batch_data['decoder_lengths'], index)
+
+  def save(self):
+    if self.path is None:
+      return
+    with open(self.path + '.tmp', 'wb') as f:
+      pickle.dump([(key, value) for key, (value, _) in self.entries.items()], f)
+    os.replace(self.path + '.tmp', self.path)
+
+
+class EncoderCache(object):
+  """Cache of encoder outputs and final states keyed by source id sequences.
+
+  Examples:
+    encoder_cache = EncoderCache(model, max_bytes=512 * 1024 ** 2)
+    feed_dict = encoder_cache.feed(sess, batch_data)
+    pred = sess.run(fetches=model.prediction, feed_dict=feed_dict)
+
+  feed runs the encoder only for sentences missing in the cache, then feeds
+  encoder outputs and states of the whole batch, so the decoder starts
+  directly from them and the encoder is skipped in the decoding run.
+  """
+
+  def __init__(self, model, max_bytes: int):
+    self.model = model
+    self.cache = LRUCache(max_bytes)
+    self.state_tensors = nest.flatten(model.encoder_state)
+
+  def feed(self, sess, batch_data: dict) -> dict:
+    inputs = batch_data['encoder_inputs']
+    lengths = batch_data['encoder_lengths']
+    keys = [source_key(inputs, lengths, i) for i in range(inputs.shape[1])]
+    entries = [self.cache.get(key) for key in keys]
+    missed = [i for i, entry in enumerate(entries) if entry is None]
+    if missed:
+      outputs, states = sess.run(
+          fetches=[self.model.encoder_outputs, self.state_tensors],
+          feed_dict={self.model.encoder_inputs: inputs[:, missed],
+                     self.model.encoder_lengths: lengths[missed]})
+      for n, i in enumerate(missed):
+        entry = (outputs[:lengths[i], n].copy(), [state[n].copy() for state in states])
+        self.cache.put(keys[i], entry)
+        entries[i] = entry
+
+    depth = entries[0][0].shape[-1]
+    encoder_outputs = np.zeros((inputs.shape[0], inputs.shape[1], depth), dtype=np.float32)
+    for i, (outputs, _) in enumerate(entries):
+      encoder_outputs[:len(outputs), i] = outputs
+    feed_dict = self.model.feed(batch_data)
+    feed_dict[self.model.encoder_outputs] = encoder_outputs
+    for k, tensor in enumerate(self.state_tensors):
+      feed_dict[tensor] = np.stack([states[k] for _, states in entries])
+    return feed_dict
@@ -0,0 +1,231 @@
+import tensorflow as tf
+from tensorflow.contrib.framework import nest
+
+ATTENTIONS = {'luong': tf.contrib.seq2seq.LuongAttention,
+              'bahdanau': tf.contrib.seq2seq.BahdanauAttention}
+CELLS = {'lstm': tf.contrib.rnn.LSTMCell,
+         'block': tf.contrib.rnn.LSTMBlockCell,
+         'fused': tf.contrib.rnn.LSTMBlockCell} # decoder steps one by one even if fused
+
+
+def session_config(option: dict):
+  """Session thread limits from intra_op_threads and inter_op_threads options, 0 is TensorFlow default."""
+  return tf.ConfigProto(intra_op_parallelism_threads=option.get('intra_op_threads', 0),
+                        inter_op_parallelism_threads=option.get('inter_op_threads', 0))
+
+
+class Seq2SeqModel(object):
+  """Encoder-decoder graph shared by the NMT examples.
+
+  Examples:
+    model = Seq2SeqModel(c.option, c.const, mode='train')
+    batch_data = seq2seq(source_batch, target_batch, max_time, vocabulary_size)
+    sess.run(fetches=[model.train_op, model.loss], feed_dict=model.feed(batch_data))
+
+  Options ([option] section of config file):
+    vocabulary_size, embedding_size, hidden_units, max_time : required
+    layers               : number of LSTM layers (default 1)
+    bidirectional        : 1 for bidirectional encoder (default 0)
+    attention            : luong | bahdanau | none (default none)
+    attention_layer_size : output size of attention wrapper (default 256)
+    beam_width           : beam width in infer mode, 1 is greedy (default 1)
+    cell                 : lstm | block | fused (default lstm)
+                           block uses LSTMBlockCell, fused additionally runs each
+                           encoder layer over the whole sequence with LSTMBlockFusedCell.
+                           Checkpoints are not compatible between cell types.
+    encoder_type         : stacked | layered (default stacked)
+                           stacked steps all layers together in a MultiRNNCell,
+                           layered runs one dynamic_rnn per layer over the previous
+                           layer's whole output sequence (always layered if fused).
+    residual             : 1 for residual connections between layers (default 0)
+    learning_rate        : learning rate of Adam (default 0.001)
+
+  mode is 'train' or 'infer'. Both modes create the same variables, so an
+  infer graph restores checkpoints of a train graph. In infer mode the
+  teacher forced loss and the inference decoder share cells and projection.
+  """
+
+  def __init__(self, option: dict, const: dict, mode='train'):
+    self.mode = mode
+    self.vocabulary_size = option['vocabulary_size']
+    self.embedding_size = option['embedding_size']
+    self.hidden_units = option['hidden_units']
+    self.max_time = option['max_time']
+    self.layers = option.get('layers', 1)
+    self.bidirectional = bool(option.get('bidirectional', 0))
+    self.attention = option.get('attention', 'none')
+    self.attention_layer_size = option.get('attention_layer_size', 256)
+    self.beam_width = option.get('beam_width', 1) if mode == 'infer' else 1
+    self.cell = option.get('cell', 'lstm')
+    self.encoder_type = 'layered' if self.cell == 'fused' else option.get('encoder_type', 'stacked')
+    self.residual = bool(option.get('residual', 0))
+    self.learning_rate = float(option.get('learning_rate', 0.001))
+    self.BOS = const['BOS']
+    self.EOS = const['EOS']
+
+    self.build_inputs()
+    self.build_encoder()
+    self.build_decoder()
+    self.build_loss()
+
+  def feed(self, batch_data: dict) -> dict:
+    """Feed dict from an output of data.data.seq2seq."""
+    return {self.encoder_inputs: batch_data['encoder_inputs'],
+            self.decoder_inputs: batch_data['decoder_inputs'],
+            self.decoder_labels: batch_data['decoder_labels'],
+            self.encoder_lengths: batch_data['encoder_lengths'],
+            self.decoder_lengths: batch_data['decoder_lengths']}
+
+  def build_inputs(self):
+    # time major, i.e. [max_time, batch_size]
+    self.encoder_inputs = tf.placeholder(shape=(None, None), dtype=tf.int32, name='encoder_inputs')
+    self.decoder_inputs = tf.placeholder(shape=(None, None), dtype=tf.int32, name='decoder_inputs')
+    self.decoder_labels = tf.placeholder(shape=(None, None), dtype=tf.int32, name='decoder_labels')
+    self.encoder_lengths = tf.placeholder(shape=(None,), dtype=tf.int32, name='encoder_lengths')
+    self.decoder_lengths = tf.placeholder(shape=(None,), dtype=tf.int32, name='decoder_lengths')
+    self.batch_size = tf.shape(self.encoder_inputs)[1]
+    self.embeddings = tf.Variable(
+        tf.random_uniform([self.vocabulary_size, self.embedding_size], -1.0, 1.0),
+        dtype=tf.float32, name='embeddings')
+
+  def build_cell(self, units: int):
+    cells = [CELLS[self.cell](units) for _ in range(self.layers)]
+    if self.residual:
+      cells = cells[:1] + [tf.contrib.rnn.ResidualWrapper(cell) for cell in cells[1:]]
+    return cells[0] if self.layers == 1 else tf.contrib.rnn.MultiRNNCell(cells)
+
+  def run_layers(self, inputs, reverse=False):
+    """Run encoder layers one by one, each over the previous layer's whole output sequence."""
+    outputs, states = inputs, []
+    for layer in range(self.layers):
+      with tf.variable_scope('layer_%d' % layer):
+        layer_inputs = outputs
+        if self.cell == 'fused':
+          cell = tf.contrib.rnn.LSTMBlockFusedCell(self.hidden_units)
+          if reverse:
+            cell = tf.contrib.rnn.TimeReversedFusedRNN(cell)
+          outputs, state = cell(layer_inputs, sequence_length=self.encoder_lengths, dtype=tf.float32)
+        else:
+          if reverse:
+            layer_inputs = tf.reverse_sequence(layer_inputs, self.encoder_lengths, seq_axis=0, batch_axis=1)
+          outputs, state = tf.nn.dynamic_rnn(
+              CELLS[self.cell](self.hidden_units), layer_inputs,
+              sequence_length=self.encoder_lengths, dtype=tf.float32, time_major=True)
+          if reverse:
+            layer_inputs = tf.reverse_sequence(layer_inputs, self.encoder_lengths, seq_axis=0, batch_axis=1)
+            outputs = tf.reverse_sequence(outputs, self.encoder_lengths, seq_axis=0, batch_axis=1)
+        if self.residual and layer > 0:
+          outputs += layer_inputs
+      states.append(state)
+    return outputs, states[0] if self.layers == 1 else tuple(states)
+
+  def build_encoder(self):
+    inputs = tf.nn.embedding_lookup(self.embeddings, self.encoder_inputs)
+    with tf.variable_scope('encoder'):
+      if self.encoder_type == 'layered':
+        with tf.variable_scope('fw'):
+          self.encoder_outputs, self.encoder_state = self.run_layers(inputs)
+        if self.bidirectional:
+          with tf.variable_scope('bw'):
+            output_bw, state_bw = self.run_layers(inputs, reverse=True)
+          self.encoder_outputs = tf.concat((self.encoder_outputs, output_bw), 2)
+          self.encoder_state = nest.map_structure(
+              lambda fw, bw: tf.concat((fw, bw), 1), self.encoder_state, state_bw)
+      elif self.bidirectional:
+        (output_fw, output_bw), (state_fw, state_bw) = tf.nn.bidirectional_dynamic_rnn(
+            self.build_cell(self.hidden_units), self.build_cell(self.hidden_units), inputs,
+            sequence_length=self.encoder_lengths, dtype=tf.float32, time_major=True)
+        self.encoder_outputs = tf.concat((output_fw, output_bw), 2)
+        self.encoder_state = nest.map_structure(
+            lambda fw, bw: tf.concat((fw, bw), 1), state_fw, state_bw)
+      else:
+        self.encoder_outputs, self.encoder_state = tf.nn.dynamic_rnn(
+            self.build_cell(self.hidden_units), inputs,
+            sequence_length=self.encoder_lengths, dtype=tf.float32, time_major=True)
+    # identities are feedable, i.e. models.inference.EncoderCache feeds them to skip the encoder
+    self.encoder_outputs = tf.identity(self.encoder_outputs, name='encoder_outputs')
+    self.encoder_state = nest.map_structure(tf.identity, self.encoder_state)
+
+  def tile(self, tensor, time_major=False):
+    """tile_batch by beam_width, it is identity in greedy decoding."""
+    if self.beam_width == 1:
+      return tensor
+    if time_major:
+      tensor = tf.transpose(tensor, [1, 0] + list(range(2, tensor.shape.ndims)))
+    tensor = tf.contrib.seq2seq.tile_batch(tensor, multiplier=self.beam_width)
+    if time_major:
+      tensor = tf.transpose(tensor, [1, 0] + list(range(2, tensor.shape.ndims)))
+    return tensor
+
+  def build_decoder(self):
+    decoder_units = self.hidden_units * 2 if self.bidirectional else self.hidden_units
+    batch_size = self.batch_size * self.beam_width
+    memory = self.tile(tf.transpose(self.encoder_outputs, [1, 0, 2])) # batch major
+    memory_length = self.tile(self.encoder_lengths)
+    encoder_state = nest.map_structure(self.tile, self.encoder_state)
+    self.output_layer = tf.layers.Dense(self.vocabulary_size, name='output_projection')
+
+    with tf.variable_scope('decoder') as scope:
+      cell = self.build_cell(decoder_units)
+      if self.attention == 'none':
+        initial_state = encoder_state
+      else:
+        attention_mechanism = ATTENTIONS[self.attention](
+            num_units=decoder_units,
+            memory=memory,
+            memory_sequence_length=memory_length)
+        cell = tf.contrib.seq2seq.AttentionWrapper(
+            cell, attention_mechanism, attention_layer_size=self.attention_layer_size)
+        initial_state = cell.zero_state(dtype=tf.float32, batch_size=batch_size).clone(
+            cell_state=encoder_state)
+
+      # teacher forcing, used by the loss in both modes
+      decoder_inputs = self.tile(self.decoder_inputs, time_major=True)
+      decoder_lengths = self.tile(self.decoder_lengths)
+      helper = tf.contrib.seq2seq.TrainingHelper(
+          inputs=tf.nn.embedding_lookup(self.embeddings, decoder_inputs),
+          sequence_length=decoder_lengths,
+          time_major=True)
+      decoder = tf.contrib.seq2seq.BasicDecoder(
+          cell=cell, helper=helper, initial_state=initial_state,
+          output_layer=self.output_layer)
+      outputs, _, _ = tf.contrib.seq2seq.dynamic_decode(
+          decoder=decoder, output_time_major=True, impute_finished=True, scope=scope)
+      self.logits = outputs.rnn_output # [max(decoder_lengths), batch_size, vocabulary_size]
+      self.prediction = tf.argmax(self.logits, 2)
+      decode_time = tf.shape(self.logits)[0]
+      self.labels = self.tile(self.decoder_labels, time_major=True)[:decode_time]
+      self.label_mask = tf.transpose(tf.sequence_mask(
+          decoder_lengths, maxlen=decode_time, dtype=tf.float32)) # time major
+
+      if self.mode == 'infer':
+        start_tokens = tf.fill([self.batch_size], self.BOS)
+        if self.beam_width > 1:
+          decoder = tf.contrib.seq2seq.BeamSearchDecoder(
+              cell=cell, embedding=self.embeddings,
+              start_tokens=start_tokens, end_token=self.EOS,
+              initial_state=initial_state, beam_width=self.beam_width,
+              output_layer=self.output_layer)
+        else:
+          helper = tf.contrib.seq2seq.GreedyEmbeddingHelper(
+              embedding=self.embeddings, start_tokens=start_tokens, end_token=self.EOS)
+          decoder = tf.contrib.seq2seq.BasicDecoder(
+              cell=cell, helper=helper, initial_state=initial_state,
+              output_layer=self.output_layer)
+        outputs, _, _ = tf.contrib.seq2seq.dynamic_decode(
+            decoder=decoder, output_time_major=True,
+            maximum_iterations=self.max_time, scope=scope)
+        if self.beam_width > 1:
+          self.prediction = outputs.predicted_ids[:, :, 0] # best beam
+        else:
+          self.prediction = outputs.sample_id
+
+  def build_loss(self):
+    stepwise_cross_entropy = tf.nn.sparse_softmax_cross_entropy_with_logits(
+        labels=self.labels, logits=self.logits)
+    # mean over valid steps, padding steps are masked out
+    self.loss = tf.reduce_sum(stepwise_cross_entropy * self.label_mask) / tf.reduce_sum(self.label_mask)
+    # summed loss of each sentence, rows tiled for beam search are dropped
+    self.sentence_loss = tf.reduce_sum(stepwise_cross_entropy * self.label_mask, 0)[::self.beam_width]
+    if self.mode == 'train':
+      self.train_op = tf.train.AdamOptimizer(self.learning_rate).minimize(self.loss)
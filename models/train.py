@@ -0,0 +1,295 @@
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from configs.configs import Configs
+from data.bpe import BPE
+from data.corpus import encode_file
+from data.data import batchnize, detokenize, iter_words, load_dictionary, padding, reversed_dictionary_to_array, save_dictionary, seq2seq
+from data.vocabulary import build_dictionary_from_files
+from models.inference import EncoderCache, ResultCache, decode, model_fingerprint
+from models.seq2seq import Seq2SeqModel, session_config
+from models.validation import BackgroundValidator, Validator
+from utils.checkpoint import BestCheckpoints, PeriodicCheckpoints
+from utils.early_stopping import EarlyStopper
+from utils.logger import Logger
+from utils.metrics import Metrics
+from utils.monitor import Monitor
+from utils.profiler import Profiler
+from utils.run_directory import POLICIES, latest_run_directory, prepare_run_directory
+from utils.timer import StepTimer
+
+
+def add_arguments(parser):
+  """Command line arguments read by run."""
+  parser.add_argument('--mode', '-m', type=str, help='train | eval')
+  parser.add_argument('--config', '-c', type=str, help='config file path')
+  parser.add_argument('--set', '-s', type=str, action='append', default=[], help='section.attribute=value overriding the config, repeatable')
+  parser.add_argument('--debug', '-d', type=bool, default=False, help='flag of debug mode')
+  parser.add_argument('--resume', '-r', action='store_true', help='resume training of the latest run from its latest periodic checkpoint')
+  parser.add_argument('--directory_policy', '-p', type=str, default='version', choices=POLICIES,
+                      help='version (new timestamped directory, eval uses the latest) | overwrite | resume (same as --resume)')
+
+def run(args, output: str, defaults=None):
+  """Train and evaluate, or only evaluate, a Seq2SeqModel built from a config.
+
+  Examples:
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    run(parser.parse_args(), 'examples/model/attention_nmt')
+
+  output is the model directory under TENSOROFLOW unless the config sets
+  output. defaults are options used when the config does not set them,
+  besides the options of Seq2SeqModel:
+    early_stopping : 'valid' feeds validation losses to EarlyStopper, 'batch' mean losses of passes (default 'valid')
+    reverse_source : 1 to reverse source sentences (default 0)
+  """
+  # process config
+  c = Configs(args.config, overrides=args.set)
+  for k, v in (defaults or {}).items():
+    c.option.setdefault(k, v)
+  ROOT = os.environ['TENSOROFLOW']
+  model_directory = '%s/%s' % (ROOT, c.option.get('output', output))
+  if args.mode == 'train':
+    args.resume = args.resume or args.directory_policy == 'resume'
+    if args.resume:
+      model_directory = prepare_run_directory(latest_run_directory(model_directory), 'resume')
+    else:
+      model_directory = prepare_run_directory(model_directory, args.directory_policy)
+    print('run directory: %s' % model_directory)
+  elif args.directory_policy == 'version':
+    model_directory = latest_run_directory(model_directory)
+  model_path = '%s/model' % model_directory
+  dictionary_path = {'source': '%s/source.vocab' % model_directory,
+                     'target': '%s/target.vocab' % model_directory}
+  bpe_path = {'source': '%s/source.bpe' % model_directory,
+              'target': '%s/target.bpe' % model_directory}
+  train_step = c.option['train_step']
+  max_time = c.option['max_time']
+  batch_size = c.option['batch_size']
+  vocabulary_size = c.option['vocabulary_size']
+  early_stopping = c.option.get('early_stopping', 'valid')
+  reverse = bool(c.option.get('reverse_source', 0))
+  workers = c.option.get('workers', 1)
+  min_count = c.option.get('min_count', 1)
+  vocabulary_capacity = c.option.get('vocabulary_capacity')
+  bpe_merges = c.option.get('bpe_merges', 0) # 0 is word level vocabulary
+  encoder_cache_bytes = c.option.get('encoder_cache_bytes', 0) # 0 is disabled
+  result_cache_bytes = c.option.get('result_cache_bytes', 0) # 0 is disabled
+  result_cache_path = '%s/result_cache.pickle' % model_directory if c.option.get('result_cache_persist', 0) else None
+  source_train_data_path = c.data['source_train_data']
+  target_train_data_path = c.data['target_train_data']
+  source_valid_data_path = c.data['source_valid_data']
+  target_valid_data_path = c.data['target_valid_data']
+  source_test_data_path = c.data['source_test_data']
+  target_test_data_path = c.data['target_test_data']
+
+  # subword segmentation
+  source_bpe, target_bpe = None, None
+  if args.mode == 'train' and bpe_merges > 0:
+    source_bpe = BPE.learn(iter_words(source_train_data_path), bpe_merges)
+    target_bpe = BPE.learn(iter_words(target_train_data_path), bpe_merges)
+  elif args.mode != 'train' and os.path.isfile(bpe_path['source']):
+    source_bpe = BPE.load(bpe_path['source'])
+    target_bpe = BPE.load(bpe_path['target'])
+  source_tokenize = source_bpe.encode if source_bpe else None
+  target_tokenize = target_bpe.encode if target_bpe else None
+
+  # read data
+  if args.mode == 'train':
+    source_dictionary, source_reverse_dictionary = build_dictionary_from_files([source_train_data_path], vocabulary_size, min_count, vocabulary_capacity, workers, source_tokenize)
+    source_train_datas = encode_file(source_train_data_path, source_dictionary, workers, source_tokenize)
+    target_dictionary, target_reverse_dictionary = build_dictionary_from_files([target_train_data_path], vocabulary_size, min_count, vocabulary_capacity, workers, target_tokenize)
+    target_train_datas = encode_file(target_train_data_path, target_dictionary, workers, target_tokenize)
+
+    source_valid_datas = encode_file(source_valid_data_path, source_dictionary, workers, source_tokenize)
+    target_valid_datas = encode_file(target_valid_data_path, target_dictionary, workers, target_tokenize)
+
+    if args.debug:
+      source_train_datas = source_train_datas[:1000]
+      target_train_datas = source_train_datas[:1000]
+  else:
+    source_dictionary, source_reverse_dictionary = load_dictionary(dictionary_path['source'])
+    target_dictionary, target_reverse_dictionary = load_dictionary(dictionary_path['target'])
+
+  source_test_datas = encode_file(source_test_data_path, source_dictionary, workers, source_tokenize)
+  target_test_datas = encode_file(target_test_data_path, target_dictionary, workers, target_tokenize)
+
+  # model
+  model = Seq2SeqModel(c.option, c.const, mode='train' if args.mode == 'train' else 'infer')
+  encoder_cache = EncoderCache(model, encoder_cache_bytes) if encoder_cache_bytes > 0 else None
+  
+  saver = tf.train.Saver()
+  minibatch_idx = {'train': 0, 'valid': 0, 'test': 0}
+  with tf.Session(config=session_config(c.option)) as sess:
+    if args.mode == 'train':
+      # train
+      global_max_step = train_step * (len(source_train_datas) // batch_size + 1)
+      loss_freq = global_max_step // 100 if global_max_step > 100 else 1
+      loss_suffix = ''
+      es = EarlyStopper(max_size=5, edge_threshold=0.1)
+      m = Monitor(global_max_step, interval=float(c.option.get('monitor_interval', 1.0)))
+      log = Logger('%s/log.jsonl' % model_directory, initialize=not args.resume, buffered=True)
+      metrics = Metrics('%s/metrics.csv' % model_directory, initialize=not args.resume)
+      sess.run(tf.global_variables_initializer())
+      best = BestCheckpoints('%s/best' % model_directory, keep=c.option.get('keep_best', 3), patience=c.option.get('patience', 10))
+      valid_batches = [seq2seq(source_valid_datas[i:i + batch_size], target_valid_datas[i:i + batch_size], max_time, vocabulary_size, reverse=reverse)
+                       for i in range(0, len(source_valid_datas), batch_size)]
+      valid_steps = c.option.get('valid_steps', loss_freq)
+      valid_minutes = float(c.option.get('valid_minutes', 0))
+      if c.option.get('valid_background', 0):
+        validator = BackgroundValidator(model, valid_batches, c.option, c.const, valid_steps, valid_minutes)
+      else:
+        validator = Validator(model, valid_batches, valid_steps, valid_minutes)
+      periodic = PeriodicCheckpoints('%s/periodic' % model_directory, c.option.get('checkpoint_steps', 0),
+                                     float(c.option.get('checkpoint_minutes', 30)), c.option.get('keep_checkpoints', 5))
+      global_step = 0
+      start_batch = 0
+      resumed_loss_log = []
+      stop_flag = False
+      state = periodic.restore(sess) if args.resume else None
+      if state is not None:
+        global_step = state['global_step']
+        start_batch = state['batch']
+        minibatch_idx = state['minibatch_idx']
+        resumed_loss_log = state['current_batch_loss_log']
+        es = state['es']
+        best.set_state(state['best'])
+        validator.schedule(global_step)
+        print('resume from step: %d' % global_step)
+      profiler = Profiler(c.option.get('profile_steps', ''), model_directory)
+      timer = StepTimer()
+      timer_suffix = ''
+      tokens = 0
+      step_tokens = 0
+      tokens_time = time.time()
+      timer.lap()
+      for batch in range(start_batch, train_step):
+        if stop_flag:
+          break
+        current_batch_loss_log, resumed_loss_log = resumed_loss_log, []
+        while True: # minibatch process
+          periodic(sess, global_step, lambda: {'global_step': global_step, 'batch': batch, 'minibatch_idx': minibatch_idx,
+                                               'current_batch_loss_log': current_batch_loss_log, 'es': es,
+                                               'best': best.get_state()})
+          timer.lap('checkpoint') # best and periodic saves
+          m.monitor(global_step, '%s %s' % (loss_suffix, timer_suffix), tokens=step_tokens)
+          timer.lap('log')
+          source_train_batch, _ = batchnize(source_train_datas, batch_size, minibatch_idx['train'])
+          target_train_batch, minibatch_idx['train'] = batchnize(target_train_datas, batch_size, minibatch_idx['train'])
+          batch_data = seq2seq(source_train_batch, target_train_batch, max_time, vocabulary_size, reverse=reverse)
+          timer.lap('data')
+          feed_dict = model.feed(batch_data)
+          timer.lap('feed')
+          _, train_loss = profiler.run(sess, [model.train_op, model.loss], feed_dict, global_step)
+          timer.lap('run')
+          step_tokens = int(batch_data['encoder_lengths'].sum() + batch_data['decoder_lengths'].sum())
+          tokens += step_tokens
+          result = validator.poll(sess, global_step)
+          timer.lap('validation') # evaluation or snapshot if due
+          if result is not None:
+            valid_step, loss_val, values = result
+            now = time.time()
+            metrics.write(global_step, train_loss=train_loss,
+                          tokens_per_sec=tokens / (now - tokens_time), learning_rate=model.learning_rate)
+            metrics.write(valid_step, valid_loss=loss_val)
+            tokens, tokens_time = 0, now
+            current_batch_loss_log.append(loss_val)
+            loss_suffix = 'loss: %f' % loss_val
+            timer.lap('log')
+            timer_suffix = timer.summary()
+            log.record(global_step, valid_step=valid_step, loss=loss_val, **timer.metrics())
+            if best(sess, loss_val, valid_step, values):
+              m.print('no improvement in %d validations, stopping at step: %d' % (best.patience, global_step))
+              stop_flag = True
+              break
+            if early_stopping == 'valid' and es(loss_val) and batch > train_step // 2:
+              m.print('early stopping at step: %d' % global_step)
+              stop_flag = True
+              break
+          global_step += 1
+          if minibatch_idx['train'] == 0:
+            batch_loss = np.mean(current_batch_loss_log)
+            metrics.write(global_step, batch_loss=batch_loss)
+            m.print('Batch: {}/{}, batch loss: {}'.format(batch + 1, train_step, batch_loss))
+            log.record(global_step, batch=batch + 1, batch_loss=batch_loss)
+            if early_stopping == 'batch' and es(batch_loss) and batch > train_step // 2:
+              m.print('early stopping at step: %d' % global_step)
+              stop_flag = True
+            break
+
+      m.close()
+      result = validator.close()
+      if result is not None: # evaluated in background after the last poll
+        valid_step, loss_val, values = result
+        metrics.write(valid_step, valid_loss=loss_val)
+        log.record(global_step, valid_step=valid_step, loss=loss_val)
+        best(sess, loss_val, valid_step, values)
+      restored = best.restore(sess)
+      if restored is not None:
+        print('restore best checkpoint, loss: %f at step: %d' % restored)
+
+      # save tf.graph and variables
+      saver.save(sess, model_path)
+      print('save at %s' % model_path)
+      metrics.close()
+      print('metrics at %s/metrics.csv, plot them by examples/plot_metrics.py' % model_directory)
+
+      # save dictionary
+      save_dictionary(dictionary_path['source'], source_dictionary)
+      save_dictionary(dictionary_path['target'], target_dictionary)
+      if source_bpe:
+        source_bpe.save(bpe_path['source'])
+        target_bpe.save(bpe_path['target'])
+
+    elif args.mode == 'eval':
+      saver.restore(sess, model_path)
+      print('load from %s' % model_path)
+
+    else:
+      raise ValueError('mode should be train or eval: %s' % args.mode)
+
+    # evaluate
+    result_cache = None
+    if result_cache_bytes > 0:
+      fingerprint = model_fingerprint(model_path, c.option, model.mode)
+      result_cache = ResultCache(fingerprint, result_cache_bytes, result_cache_path)
+    loss_val = []
+    predict_vectors = []
+    for i in range(len(source_test_datas) // batch_size + 1):
+      source_test_batch, _ = batchnize(source_test_datas, batch_size, minibatch_idx['test'])
+      target_test_batch, minibatch_idx['test'] = batchnize(target_test_datas, batch_size, minibatch_idx['test'])
+      batch_data = seq2seq(source_test_batch, target_test_batch, max_time, vocabulary_size, reverse=reverse)
+      pred, sentence_loss = decode(sess, model, batch_data, max_time, encoder_cache, result_cache)
+      predict_vectors.append(pred.T)
+      loss_val.append(sentence_loss.sum() / batch_data['decoder_lengths'].sum())
+
+    predict_vectors = np.concatenate(predict_vectors)[:len(target_test_datas)]
+    input_vectors = np.array([padding(data, max_time) for data in source_test_datas])
+    input_lengths = [min(len(data), max_time) for data in source_test_datas]
+    input_sentences = '\n'.join(detokenize(input_vectors, reversed_dictionary_to_array(source_reverse_dictionary), lengths=input_lengths))
+    predict_sentences = '\n'.join(detokenize(predict_vectors, reversed_dictionary_to_array(target_reverse_dictionary)))
+
+    if source_bpe:
+      input_sentences = source_bpe.restore(input_sentences)
+      predict_sentences = target_bpe.restore(predict_sentences)
+
+    evaluate_input_path = '%s.evaluate_input' % model_path
+    evaluate_predict_path = '%s.evaluate_predict' % model_path
+    with open(evaluate_input_path, 'w') as f1, \
+         open(evaluate_predict_path, 'w') as f2:
+      f1.write(input_sentences)
+      f2.write(predict_sentences)
+
+    print('input sequences at {}'.format(evaluate_input_path))
+    print('predict sequences at {}'.format(evaluate_predict_path))
+    print('mean of loss: %f' % np.mean(loss_val))
+    if result_cache is not None:
+      result_cache.save()
+      print('result cache: %s' % result_cache.stats())
+    if encoder_cache is not None:
+      print('encoder cache: %s' % encoder_cache.cache.stats())
+
+  print('finish.')
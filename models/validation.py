@@ -0,0 +1,128 @@
+import multiprocessing
+import queue
+import time
+
+import tensorflow as tf
+
+from models.seq2seq import Seq2SeqModel, session_config
+
+
+def evaluate(sess, model, batches: list) -> float:
+  """Mean loss per target token over batches, one run per batch."""
+  loss_sum = 0.0
+  tokens = 0
+  for batch_data in batches:
+    loss_sum += sess.run(fetches=model.sentence_loss, feed_dict=model.feed(batch_data)).sum()
+    tokens += batch_data['decoder_lengths'].sum()
+  return loss_sum / tokens
+
+
+class Validator(object):
+  """Evaluate the whole valid set every steps steps or minutes minutes, whichever comes first.
+
+  Examples:
+    valid_batches = [seq2seq(source[i:i + batch_size], target[i:i + batch_size], max_time, vocabulary_size)
+                     for i in range(0, len(source), batch_size)]
+    validator = Validator(model, valid_batches, steps=1000, minutes=10)
+    result = validator.poll(sess, global_step)
+    if result is not None:
+      valid_step, loss_val, values = result # values are None, i.e. current variables
+
+  0 disables steps or minutes.
+  """
+
+  def __init__(self, model, batches: list, steps=0, minutes=0.0):
+    self.model = model
+    self.batches = batches
+    self.steps = steps
+    self.seconds = minutes * 60
+    self.last_step = 0
+    self.last_time = time.monotonic()
+
+  def due(self, step: int) -> bool:
+    if self.steps > 0 and step - self.last_step >= self.steps:
+      return True
+    return self.seconds > 0 and time.monotonic() - self.last_time >= self.seconds
+
+  def schedule(self, step: int):
+    self.last_step = step
+    self.last_time = time.monotonic()
+
+  def poll(self, sess, step: int):
+    if not self.due(step):
+      return None
+    self.schedule(step)
+    return step, evaluate(sess, self.model, self.batches), None
+
+  def close(self):
+    return None
+
+
+class BackgroundValidator(Validator):
+  """Validator evaluating snapshots of variables in another process.
+
+  Examples:
+    validator = BackgroundValidator(model, valid_batches, c.option, c.const, steps=1000)
+    result = validator.poll(sess, global_step) # never blocks on evaluation
+    if result is not None:
+      valid_step, loss_val, values = result # values of the variables at valid_step
+
+  The process builds the same Seq2SeqModel, so variables correspond in the
+  order of tf.trainable_variables(). Only trainable variables are sent, the
+  optimizer slots are not needed by the loss. One snapshot is in flight at a
+  time, a due step is skipped while the previous snapshot is being evaluated.
+  close waits for the snapshot in flight and returns its result.
+  """
+
+  def __init__(self, model, batches: list, option: dict, const: dict, steps=0, minutes=0.0):
+    super(BackgroundValidator, self).__init__(model, batches, steps, minutes)
+    self.variables = tf.trainable_variables()
+    context = multiprocessing.get_context('spawn')
+    self.requests = context.Queue()
+    self.results = context.Queue()
+    self.process = context.Process(target=_validate_worker,
+                                   args=(option, const, batches, self.requests, self.results),
+                                   daemon=True)
+    self.process.start()
+    self.pending = None # (step, values) being evaluated
+
+  def poll(self, sess, step: int):
+    result = None
+    if self.pending is not None:
+      try:
+        valid_step, loss = self.results.get_nowait()
+        result = valid_step, loss, self.pending[1]
+        self.pending = None
+      except queue.Empty:
+        pass
+    if self.pending is None and self.due(step):
+      self.schedule(step)
+      values = sess.run(self.variables)
+      self.pending = (step, values)
+      self.requests.put((step, values))
+    return result
+
+  def close(self):
+    """Stop the process, return the result of the pending snapshot like poll or None."""
+    result = None
+    if self.pending is not None:
+      valid_step, loss = self.results.get()
+      result = valid_step, loss, self.pending[1]
+      self.pending = None
+    self.requests.put(None)
+    self.process.join()
+    return result
+
+
+def _validate_worker(option: dict, const: dict, batches: list, requests, results):
+  model = Seq2SeqModel(option, const, mode='train')
+  variables = tf.trainable_variables()
+  with tf.Session(config=session_config(option)) as sess:
+    while True:
+      request = requests.get()
+      if request is None:
+        break
+      step, values = request
+      for variable, value in zip(variables, values):
+        variable.load(value, sess)
+      results.put((step, evaluate(sess, model, batches)))
@@ -0,0 +1,63 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+def nbytes(value) -> int:
+  """Approximate memory size of numpy arrays, bytes and strings in nested lists, tuples and dicts."""
+  if isinstance(value, np.ndarray):
+    return value.nbytes
+  if isinstance(value, (bytes, str)):
+    return len(value)
+  if isinstance(value, dict):
+    return sum(nbytes(k) + nbytes(v) for k, v in value.items())
+  if isinstance(value, (list, tuple)):
+    return sum(nbytes(v) for v in value)
+  return 8
+
+
+class LRUCache(object):
+  """Least recently used cache bounded by total bytes of keys and values.
+
+  Examples:
+    cache = LRUCache(max_bytes=256 * 1024 ** 2)
+    cache.put(key, value)
+    value = cache.get(key) # None if missed
+  """
+
+  def __init__(self, max_bytes: int):
+    self.max_bytes = max_bytes
+    self.bytes = 0
+    self.entries = OrderedDict() # key -> (value, size)
+    self.hits = 0
+    self.misses = 0
+
+  def __len__(self):
+    return len(self.entries)
+
+  def __contains__(self, key):
+    return key in self.entries
+
+  def get(self, key):
+    if not key in self.entries:
+      self.misses += 1
+      return None
+    self.hits += 1
+    self.entries.move_to_end(key)
+    return self.entries[key][0]
+
+  def put(self, key, value):
+    size = nbytes(key) + nbytes(value)
+    if key in self.entries:
+      self.bytes -= self.entries.pop(key)[1]
+    if size > self.max_bytes:
+      return
+    self.entries[key] = (value, size)
+    self.bytes += size
+    while self.bytes > self.max_bytes:
+      _, (_, evicted) = self.entries.popitem(last=False)
+      self.bytes -= evicted
+
+  def stats(self) -> str:
+    return 'hit: {}, miss: {}, entries: {}, bytes: {}'.format(
+        self.hits, self.misses, len(self.entries), self.bytes)
@@ -0,0 +1,159 @@
+from bisect import insort
+import glob
+import os
+import pickle
+import random
+import threading
+import time
+
+import numpy as np
+import tensorflow as tf
+
+
+class BestCheckpoints(object):
+  """Keep the keep best checkpoints by validation loss and stop after patience evaluations without improvement.
+
+  Examples:
+    best = BestCheckpoints('%s/best' % model_directory, keep=3, patience=10)
+    if best(sess, loss_val, global_step):
+      stop_flag = True
+    best(sess, loss_val, valid_step, values) # saves values instead of current variables
+    best.restore(sess) # variables of the best checkpoint
+
+  Variables are copied into memory by one sess.run, then written as .npz by a
+  background thread, so the training loop does not wait for the disk.
+  var_list defaults to tf.trainable_variables(), the order of values given by
+  models.validation.BackgroundValidator.
+  """
+
+  def __init__(self, directory: str, keep=3, patience=10, min_delta=0.0, var_list=None):
+    self.directory = directory
+    self.keep = keep
+    self.patience = patience
+    self.min_delta = min_delta
+    self.variables = var_list or tf.trainable_variables()
+    self.best = [] # (loss, step, path) sorted by loss, at most keep
+    self.best_loss = float('inf')
+    self.bad_evaluations = 0
+    self.thread = None
+    os.makedirs(directory, exist_ok=True)
+
+  def __call__(self, sess, loss: float, step: int, values=None) -> bool:
+    """Save if loss is in the best ones, return True if it is time to stop."""
+    if loss < self.best_loss - self.min_delta:
+      self.best_loss = loss
+      self.bad_evaluations = 0
+    else:
+      self.bad_evaluations += 1
+    if len(self.best) < self.keep or loss < self.best[-1][0]:
+      self.save(sess, loss, step, values)
+    return self.bad_evaluations >= self.patience
+
+  def save(self, sess, loss: float, step: int, values=None):
+    if values is None:
+      values = sess.run(self.variables)
+    path = '%s/step-%d.npz' % (self.directory, step)
+    insort(self.best, (float(loss), step, path))
+    evicted = [path for _, _, path in self.best[self.keep:]]
+    self.best = self.best[:self.keep]
+    self.wait()
+    self.thread = threading.Thread(target=self.write, args=(path, values, evicted))
+    self.thread.start()
+
+  def write(self, path: str, values: list, evicted: list):
+    with open(path + '.tmp', 'wb') as f:
+      np.savez(f, *values)
+    os.replace(path + '.tmp', path)
+    for evicted_path in evicted:
+      if os.path.isfile(evicted_path):
+        os.remove(evicted_path)
+
+  def get_state(self) -> dict:
+    self.wait()
+    return {'best': list(self.best), 'best_loss': self.best_loss, 'bad_evaluations': self.bad_evaluations}
+
+  def set_state(self, state: dict):
+    """Restore a state of get_state, removing checkpoints saved after it so keep bounds the directory."""
+    self.best = [entry for entry in state['best'] if os.path.isfile(entry[2])]
+    self.best_loss = state['best_loss']
+    self.bad_evaluations = state['bad_evaluations']
+    kept = set(path for _, _, path in self.best)
+    for path in glob.glob('%s/step-*.npz*' % self.directory):
+      if not path in kept:
+        os.remove(path)
+
+  def wait(self):
+    if self.thread is not None:
+      self.thread.join()
+      self.thread = None
+
+  def restore(self, sess):
+    """Load the best checkpoint into variables, return its (loss, step) or None if nothing saved."""
+    self.wait()
+    if not self.best:
+      return None
+    loss, step, path = self.best[0]
+    with np.load(path) as values:
+      for i, variable in enumerate(self.variables):
+        variable.load(values['arr_%d' % i], sess)
+    return loss, step
+
+
+class PeriodicCheckpoints(object):
+  """Save a checkpoint with a state sidecar every steps steps or minutes minutes, keeping the latest keep.
+
+  Examples:
+    periodic = PeriodicCheckpoints('%s/periodic' % model_directory, steps=1000, minutes=30, keep=5)
+    state = periodic.restore(sess) if args.resume else None # None if nothing saved
+    periodic(sess, global_step, lambda: {'global_step': global_step, 'minibatch_idx': minibatch_idx, 'es': es})
+
+  state is a function returning a dict, called only when saving. The sidecar
+  <checkpoint>.state is a pickle of the dict plus numpy and python RNG
+  states, which restore sets back. 0 disables steps or minutes.
+  """
+
+  def __init__(self, directory: str, steps=0, minutes=0.0, keep=5):
+    self.directory = directory
+    self.steps = steps
+    self.seconds = minutes * 60
+    self.saver = tf.train.Saver(max_to_keep=keep)
+    self.last_step = 0
+    self.last_time = time.monotonic()
+    os.makedirs(directory, exist_ok=True)
+
+  def __call__(self, sess, step: int, state) -> bool:
+    """Save if due, return True if saved."""
+    due = self.steps > 0 and step - self.last_step >= self.steps
+    due = due or (self.seconds > 0 and time.monotonic() - self.last_time >= self.seconds)
+    if due:
+      self.save(sess, step, state())
+    return due
+
+  def save(self, sess, step: int, state: dict):
+    self.last_step = step
+    self.last_time = time.monotonic()
+    state = dict(state, numpy_random=np.random.get_state(), python_random=random.getstate())
+    path = '%s/model-%d' % (self.directory, step)
+    # sidecar first, a checkpoint listed in the checkpoint file always has its state
+    with open(path + '.state.tmp', 'wb') as f:
+      pickle.dump(state, f)
+    os.replace(path + '.state.tmp', path + '.state')
+    self.saver.save(sess, '%s/model' % self.directory, global_step=step)
+    kept = set(self.saver.last_checkpoints)
+    for state_path in glob.glob('%s/model-*.state' % self.directory):
+      if not state_path[:-len('.state')] in kept:
+        os.remove(state_path)
+
+  def restore(self, sess):
+    """Restore variables and RNG states of the latest checkpoint, return its state or None."""
+    path = tf.train.latest_checkpoint(self.directory)
+    if path is None:
+      return None
+    self.saver.restore(sess, path)
+    self.saver.recover_last_checkpoints(tf.train.get_checkpoint_state(self.directory).all_model_checkpoint_paths)
+    with open(path + '.state', 'rb') as f:
+      state = pickle.load(f)
+    np.random.set_state(state.pop('numpy_random'))
+    random.setstate(state.pop('python_random'))
+    self.last_step = state.get('global_step', 0)
+    return state
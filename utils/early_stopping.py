@@ -1,14 +1,24 @@
-from bisect import bisect
+from bisect import bisect, insort
 import numpy as np
-from typing import List, Sequence, TypeVar
+from typing import List
 
 
 class EarlyStopper(object):
+  """Stop when losses in a window of max_size evaluations flatten out.
 
-  def __init__(self, max_size: int, edge_threshold: int, 
+  The window is a ring buffer with a running sum of edges (absolute
+  differences of consecutive losses), and sampled edges are kept sorted,
+  so each evaluation costs O(1) except sampling (O(log sample) per edge).
+  """
+
+  def __init__(self, max_size: int, edge_threshold: int,
                sample=100, lower_threshold=30):
-    self.queue = []
-    self.edge = []
+    self.buffer = np.zeros(max_size, dtype=np.float64)
+    self.start = 0 # index of the oldest data
+    self.size = 0
+    self.edge_sum = 0.0
+    self.pushes = 0
+    self.edge = [] # sampled edges, sorted
     self.max_size = max_size # number of queue size
     self.edge_threshold = edge_threshold # stopping threshold of edge
     self.sample = sample # number of sample edge
@@ -18,44 +28,59 @@ class EarlyStopper(object):
     self.enqueue(data)
     return self.check_status()
 
+  @property
+  def queue(self) -> List[float]:
+    """Data in the window, oldest first."""
+    return self.buffer[(self.start + np.arange(self.size)) % self.max_size].tolist()
+
+  def at(self, i: int) -> float:
+    return self.buffer[(self.start + i) % self.max_size]
+
   def enqueue(self, data: float):
-    if len(self.queue) < self.max_size:
-      self.queue.append(data)
-    else:
+    if self.size == self.max_size:
       _ = self.dequeue()
-      self.enqueue(data)
-     
+    if self.size > 0:
+      self.edge_sum += abs(data - self.at(self.size - 1))
+    self.buffer[(self.start + self.size) % self.max_size] = data
+    self.size += 1
+    self.pushes += 1
+    if self.pushes % self.max_size == 0: # cancel accumulated rounding errors
+      self.edge_sum = float(np.sum(self.get_edge()))
+
   def dequeue(self) -> float:
-    data = self.queue[0]
-    self.queue = self.queue[1:]
+    data = self.at(0)
+    if self.size > 1:
+      self.edge_sum -= abs(self.at(1) - data)
+    self.start = (self.start + 1) % self.max_size
+    self.size -= 1
+    if self.size < 2:
+      self.edge_sum = 0.0
     return data
 
   def get_edge(self) -> List[float]:
-    edge = []
-    if len(self.queue) < 2:
-      return edge
-    for i in range(0, len(self.queue) - 1):
-      edge.append(abs(self.queue[i + 1] - self.queue[i]))
-    return edge
+    if self.size < 2:
+      return []
+    return np.abs(np.diff(self.queue)).tolist()
 
   def sample_edge(self, sample=100):
     if len(self.edge) < sample:
       edge = self.get_edge()
       for e in edge:
         if len(self.edge) < sample:
-          self.edge.append(e)
+          insort(self.edge, e)
         else:
           return False # sampling had finished
       return True
     else:
       return False # sampling had finished
-    
+
+  def mean_edge(self) -> float:
+    return self.edge_sum / (self.size - 1)
+
   def check_status(self):
-    edge = self.get_edge()
-    if edge == []:
+    if self.size < 2:
       return False
-    recent_edge = np.mean(self.get_edge())
-    if recent_edge < self.edge_threshold:
+    if self.mean_edge() < self.edge_threshold:
       return True
     else:
       return False
@@ -65,10 +90,9 @@ class EarlyStopper(object):
     """
     if self.sample_edge(self.sample):
       return False
-    rank = sorted(self.edge)
-    recent_edge = np.mean(self.get_edge())
-    if bisect(rank, recent_edge) < self.lower_threshold:
+    if self.size < 2:
+      return False
+    if bisect(self.edge, self.mean_edge()) < self.lower_threshold:
       return True
     else:
       return False
-
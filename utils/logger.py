@@ -1,13 +1,68 @@
+import atexit
+import json
 import os
+import queue
+import threading
+import time
 
 class Logger(object):
+  """Append strings or JSON line records to a log file.
 
-  def __init__(self, log_file, initialize=True):
+  Examples:
+    log = Logger('examples/model/attention_nmt/log.jsonl', buffered=True)
+    log.record(global_step, loss=loss_val) # => {"step": 100, "time": 1518.0, "loss": 2.3}
+    log('free text\n')
+
+  Without buffered, every call opens, appends and closes the file. With
+  buffered, a background thread keeps the file open and flushes it every
+  flush_bytes bytes or flush_interval seconds, and at close or exit.
+  """
+
+  def __init__(self, log_file, initialize=True, buffered=False, flush_bytes=1 << 16, flush_interval=5.0):
     self.log_file = log_file
     if initialize:
       if os.path.isfile(log_file):
         os.remove(log_file)
+    self.buffered = buffered
+    self.flush_bytes = flush_bytes
+    self.flush_interval = flush_interval
+    if buffered:
+      self.queue = queue.Queue()
+      self.thread = threading.Thread(target=self.write_loop, daemon=True)
+      self.thread.start()
+      atexit.register(self.close)
 
   def __call__(self, data):
+    if self.buffered:
+      self.queue.put(data)
+      return
     with open(self.log_file, 'a') as f:
       f.write(data)
+
+  def record(self, step, **metrics):
+    record = dict(step=step, time=time.time(), **metrics)
+    self(json.dumps(record, default=float) + '\n')
+
+  def write_loop(self):
+    with open(self.log_file, 'a', buffering=self.flush_bytes) as f:
+      size = 0
+      flushed = time.monotonic()
+      while True:
+        try:
+          data = self.queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+          data = ''
+        if data is None:
+          break
+        f.write(data)
+        size += len(data)
+        if size >= self.flush_bytes or time.monotonic() - flushed >= self.flush_interval:
+          f.flush()
+          size = 0
+          flushed = time.monotonic()
+
+  def close(self):
+    """Write out queued data and stop the writer thread of buffered mode."""
+    if self.buffered and self.thread.is_alive():
+      self.queue.put(None)
+      self.thread.join()
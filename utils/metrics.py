@@ -0,0 +1,46 @@
+import csv
+import os
+import time
+
+import numpy as np
+
+
+class Metrics(object):
+  """Append-only CSV of scalars, one row of step, time, name and value per scalar.
+
+  Examples:
+    metrics = Metrics('examples/model/attention_nmt/metrics.csv')
+    metrics.write(global_step, train_loss=2.5, valid_loss=2.7)
+    steps, values = read_metrics('examples/model/attention_nmt/metrics.csv')['valid_loss']
+
+  Rows are written through line by line, so the file is readable while
+  training runs and nothing is kept in memory.
+  """
+
+  def __init__(self, path: str, initialize=True):
+    if initialize and os.path.isfile(path):
+      os.remove(path)
+    new_file = not os.path.isfile(path)
+    self.file = open(path, 'a', buffering=1, newline='')
+    self.writer = csv.writer(self.file)
+    if new_file:
+      self.writer.writerow(['step', 'time', 'name', 'value'])
+
+  def write(self, step: int, **scalars):
+    now = time.time()
+    for name, value in scalars.items():
+      self.writer.writerow([step, '%.3f' % now, name, float(value)])
+
+  def close(self):
+    self.file.close()
+
+
+def read_metrics(path: str) -> dict:
+  """name -> (steps, values) arrays of a file written by Metrics."""
+  series = dict()
+  with open(path, newline='') as f:
+    for row in csv.DictReader(f):
+      steps, values = series.setdefault(row['name'], ([], []))
+      steps.append(int(row['step']))
+      values.append(float(row['value']))
+  return dict((name, (np.array(steps), np.array(values))) for name, (steps, values) in series.items())
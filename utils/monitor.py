@@ -1,26 +1,62 @@
 from datetime import datetime
+import json
 import math
+import sys
+import time
 
 
 MAX_BAR = 30
+SMOOTHING = 0.3 # weight of the latest interval in moving averages of rates
 
 
 class Monitor(object):
-  
-  def __init__(self, length):
+  """Progress of training steps.
+
+  Examples:
+    m = Monitor(train_step)
+    m.monitor(i, 'loss: %f' % loss) # prints about 130 lines over a run
+
+    m = Monitor(train_step, interval=1.0)
+    m.monitor(i, 'loss: %f' % loss, tokens=step_tokens)
+    m.print('Batch: 1/10') # other messages, keeping the progress line
+    m.close()
+
+  With interval, the progress is refreshed at most once per interval seconds
+  with smoothed steps/sec, tokens/sec and ETA. On a TTY it is redrawn in
+  place, otherwise one JSON record is printed per refresh and per message.
+  """
+
+  def __init__(self, length, interval=None, stream=None):
     self.idx = 0
     self.length = length
     self.num = '{}/{}'.format(self.idx, self.length)
     self.bar = '.' * MAX_BAR
     self.divider1 = length // 100 if length >= 100 else 1
     self.divider2 = length // MAX_BAR if length >= MAX_BAR else 1
+    self.suffix = ''
+    self.interval = interval
+    self.stream = stream or sys.stdout
+    self.tty = self.stream.isatty()
+    self.last_time = time.monotonic()
+    self.last_idx = 0
+    self.tokens = 0
+    self.steps_per_sec = None
+    self.tokens_per_sec = None
+    self.line = ''
 
   def __str__(self):
     return '{} [{}] - TIME: {} {}'.format(self.num, self.bar,
                                        datetime.now().strftime('%H:%M:%S'),
                                        self.suffix)
 
-  def monitor(self, idx, suffix=''):
+  def monitor(self, idx, suffix='', tokens=0):
+    if self.interval is not None:
+      self.idx = idx
+      self.tokens += tokens
+      now = time.monotonic()
+      if now - self.last_time >= self.interval:
+        self.refresh(idx, suffix, now)
+      return
     flag = 0
     if idx % self.divider1 == 0 or idx % self.divider2 == 0:
       self.idx = idx
@@ -32,7 +68,51 @@ class Monitor(object):
     if flag == 1:
       self.suffix = suffix
       print(self)
-  
+
+  def refresh(self, idx, suffix, now):
+    elapsed = max(now - self.last_time, 1e-9) # 0 with interval 0 or a coarse clock
+    steps_per_sec = (idx - self.last_idx) / elapsed
+    tokens_per_sec = self.tokens / elapsed
+    if self.steps_per_sec is None:
+      self.steps_per_sec, self.tokens_per_sec = steps_per_sec, tokens_per_sec
+    else:
+      self.steps_per_sec += SMOOTHING * (steps_per_sec - self.steps_per_sec)
+      self.tokens_per_sec += SMOOTHING * (tokens_per_sec - self.tokens_per_sec)
+    eta = (self.length - idx) / self.steps_per_sec if self.steps_per_sec > 0 else float('inf')
+    self.last_time, self.last_idx, self.tokens = now, idx, 0
+
+    if self.tty:
+      self.idx = idx
+      self.update_num()
+      filled = min(MAX_BAR, MAX_BAR * idx // self.length)
+      self.bar = '=' * filled + '.' * (MAX_BAR - filled)
+      line = '{} [{}] {:.1f} steps/s {:.0f} tokens/s ETA {} {}'.format(
+          self.num, self.bar, self.steps_per_sec, self.tokens_per_sec, format_seconds(eta), suffix)
+      self.stream.write('\r' + line.ljust(len(self.line)))
+      self.stream.flush()
+      self.line = line
+    else:
+      record = {'step': idx, 'length': self.length, 'steps_per_sec': self.steps_per_sec,
+                'tokens_per_sec': self.tokens_per_sec, 'eta_sec': eta, 'suffix': suffix}
+      self.stream.write(json.dumps(record) + '\n')
+      self.stream.flush()
+
+  def print(self, message):
+    """Print a message line, the in place progress line is drawn again at next refresh."""
+    if self.interval is not None and not self.tty:
+      self.stream.write(json.dumps({'step': self.idx, 'message': message}) + '\n')
+      self.stream.flush()
+      return
+    if self.interval is not None and self.line:
+      self.stream.write('\r' + ' ' * len(self.line) + '\r')
+      self.line = ''
+    print(message, file=self.stream)
+
+  def close(self):
+    if self.interval is not None and self.tty and self.line:
+      self.stream.write('\n')
+      self.line = ''
+
   def update_bar(self):
     top = self.bar.find('>')
     if top == -1:
@@ -45,4 +125,10 @@ class Monitor(object):
   def update_num(self):
     idx = str(self.idx).rjust(int(math.log10(self.length)) + 1, ' ')
     self.num = '{}/{}'.format(idx, self.length)
-    
+
+
+def format_seconds(seconds: float) -> str:
+  if math.isinf(seconds):
+    return '--:--:--'
+  seconds = int(seconds)
+  return '{:02d}:{:02d}:{:02d}'.format(seconds // 3600, seconds // 60 % 60, seconds % 60)
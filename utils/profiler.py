@@ -0,0 +1,69 @@
+from collections import defaultdict
+import os
+
+import tensorflow as tf
+from tensorflow.python.client import timeline
+
+
+def parse_steps(steps) -> set:
+  """Steps from a config value, i.e. 100 or '100-110' or [5, 10, '20-25']. Ranges include both ends."""
+  parts = steps if isinstance(steps, list) else str(steps).split(',')
+  selected = set()
+  for part in parts:
+    part = str(part).strip()
+    if part == '':
+      continue
+    if '-' in part:
+      start, end = part.split('-')
+      selected.update(range(int(start), int(end) + 1))
+    else:
+      selected.add(int(part))
+  return selected
+
+
+class Profiler(object):
+  """Run selected steps with full trace, write Chrome timelines and a per-op cost table.
+
+  Examples:
+    profiler = Profiler(c.option.get('profile_steps', ''), model_directory)
+    profiler.run(sess, [model.train_op, model.loss], feed_dict, global_step)
+
+  For each profiled step, directory/timeline_<step>.json is written (open it
+  in chrome://tracing). directory/op_costs.tsv has compute time of each op
+  summed over the profiled steps so far, sorted by total time.
+  """
+
+  def __init__(self, steps, directory: str):
+    self.steps = parse_steps(steps)
+    self.directory = directory
+    self.costs = defaultdict(lambda: [0, 0]) # (op name, op type) -> [calls, total micros]
+
+  def run(self, sess, fetches, feed_dict: dict, step: int):
+    if not step in self.steps:
+      return sess.run(fetches=fetches, feed_dict=feed_dict)
+    options = tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE)
+    run_metadata = tf.RunMetadata()
+    result = sess.run(fetches=fetches, feed_dict=feed_dict, options=options, run_metadata=run_metadata)
+    os.makedirs(self.directory, exist_ok=True)
+    trace = timeline.Timeline(run_metadata.step_stats).generate_chrome_trace_format()
+    with open('%s/timeline_%d.json' % (self.directory, step), 'w') as f:
+      f.write(trace)
+    self.add(run_metadata.step_stats)
+    self.save()
+    return result
+
+  def add(self, step_stats):
+    for device in step_stats.dev_stats:
+      for node in device.node_stats:
+        label = node.timeline_label
+        op = label.split(' = ')[1].split('(')[0] if ' = ' in label else node.node_name
+        cost = self.costs[(node.node_name, op)]
+        cost[0] += 1
+        cost[1] += node.op_end_rel_micros - node.op_start_rel_micros
+
+  def save(self):
+    total = sum(micros for _, micros in self.costs.values()) or 1
+    with open('%s/op_costs.tsv' % self.directory, 'w') as f:
+      f.write('name\top\tcalls\ttotal_us\tmean_us\tshare\n')
+      for (name, op), (calls, micros) in sorted(self.costs.items(), key=lambda item: -item[1][1]):
+        f.write('{}\t{}\t{}\t{}\t{:.1f}\t{:.4f}\n'.format(name, op, calls, micros, micros / calls, micros / total))
@@ -0,0 +1,116 @@
+import atexit
+import glob
+import os
+import re
+import shutil
+import socket
+import time
+
+LOCK_FILE = 'LOCK'
+POLICIES = ['overwrite', 'resume', 'version']
+
+
+def lock_owner(directory: str):
+  """(host, pid) of a live process holding the lock of directory, or None."""
+  path = os.path.join(directory, LOCK_FILE)
+  try:
+    with open(path) as f:
+      host, pid = f.read().split()
+  except (FileNotFoundError, ValueError):
+    return None
+  if host != socket.gethostname():
+    return host, int(pid) # cannot check processes of other hosts
+  try:
+    os.kill(int(pid), 0)
+  except ProcessLookupError:
+    return None # stale lock
+  except PermissionError:
+    pass
+  return host, int(pid)
+
+def acquire_lock(directory: str):
+  """Create directory/LOCK or raise RuntimeError if another live process holds it. Released at exit."""
+  path = os.path.join(directory, LOCK_FILE)
+  temp_path = '%s.%s-%d' % (path, socket.gethostname(), os.getpid())
+  with open(temp_path, 'w') as f:
+    f.write('%s %d\n' % (socket.gethostname(), os.getpid()))
+  try:
+    while True:
+      try:
+        os.link(temp_path, path) # fails if path exists, the file appears with its contents
+        break
+      except FileExistsError:
+        owner = lock_owner(directory)
+        if owner is not None and owner != (socket.gethostname(), os.getpid()):
+          raise RuntimeError('%s is locked by process %d on %s' % (directory, owner[1], owner[0]))
+        try:
+          os.remove(path)
+        except FileNotFoundError:
+          pass # another process removed the stale lock first
+  finally:
+    os.remove(temp_path)
+  atexit.register(release_lock, directory)
+
+def release_lock(directory: str):
+  path = os.path.join(directory, LOCK_FILE)
+  owner = lock_owner(directory)
+  if owner == (socket.gethostname(), os.getpid()):
+    os.remove(path)
+
+def prepare_run_directory(model_directory: str, policy: str) -> str:
+  """Make the directory of a training run without asking, and lock it.
+
+  Examples:
+    model_directory = prepare_run_directory('examples/model/attention_nmt', 'version')
+    # => 'examples/model/attention_nmt-20180219-153000'
+
+  policy is one of
+    overwrite : remove the contents of model_directory if it exists
+    resume    : keep model_directory and its contents
+    version   : make a new timestamped directory next to model_directory
+
+  The lock is taken before anything in the directory is removed or reused,
+  so a directory of a running process is never touched.
+  """
+  if not policy in POLICIES:
+    raise ValueError('policy should be one of %s: %s' % (POLICIES, policy))
+  directory = model_directory
+  if policy == 'version':
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    directory = '%s-%s' % (model_directory, stamp)
+    n = 1
+    while True:
+      try:
+        os.makedirs(directory) # fails if another process made it first
+        break
+      except FileExistsError:
+        n += 1
+        directory = '%s-%s-%d' % (model_directory, stamp, n)
+  os.makedirs(directory, exist_ok=True)
+  acquire_lock(directory)
+  if policy == 'overwrite':
+    for name in os.listdir(directory):
+      path = os.path.join(directory, name)
+      if name == LOCK_FILE:
+        continue
+      if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+      else:
+        os.remove(path)
+  return directory
+
+def latest_run_directory(model_directory: str) -> str:
+  """The newest versioned directory made by prepare_run_directory, or model_directory if none.
+
+  Only <model_directory>-%Y%m%d-%H%M%S(-N) names count, ordered by the stamp
+  and N, so sibling runs with longer names and mtimes of old runs do not.
+  """
+  pattern = re.compile(re.escape(os.path.basename(model_directory)) + r'-(\d{8}-\d{6})(?:-(\d+))?$')
+  versions = []
+  for path in glob.glob('%s-*' % model_directory):
+    match = pattern.match(os.path.basename(path))
+    if match and os.path.isdir(path):
+      versions.append(((match.group(1), int(match.group(2) or 1)), path))
+  if not versions:
+    return model_directory
+  return max(versions)[1]
@@ -0,0 +1,80 @@
+from collections import OrderedDict
+import time
+
+import numpy as np
+
+BUCKETS = np.logspace(-5, 2, 29) # upper bounds in seconds, 10us to 100s, 4 per decade
+
+
+class Histogram(object):
+  """Running histogram of durations over log scale buckets."""
+
+  def __init__(self):
+    self.counts = np.zeros(len(BUCKETS) + 1, dtype=np.int64)
+    self.count = 0
+    self.total = 0.0
+    self.max = 0.0
+
+  def add(self, seconds: float):
+    self.counts[np.searchsorted(BUCKETS, seconds)] += 1
+    self.count += 1
+    self.total += seconds
+    self.max = max(self.max, seconds)
+
+  def mean(self) -> float:
+    return self.total / self.count if self.count else 0.0
+
+  def percentile(self, q: float) -> float:
+    """q-th percentile, interpolated linearly in its bucket."""
+    if self.count == 0:
+      return 0.0
+    cumulative = np.cumsum(self.counts)
+    rank = self.count * q / 100
+    bucket = np.searchsorted(cumulative, rank)
+    lower = BUCKETS[bucket - 1] if bucket > 0 else 0.0
+    upper = BUCKETS[bucket] if bucket < len(BUCKETS) else self.max
+    below = cumulative[bucket - 1] if bucket > 0 else 0
+    value = lower + (upper - lower) * (rank - below) / self.counts[bucket]
+    return min(value, self.max)
+
+
+class StepTimer(object):
+  """Per phase durations of training steps.
+
+  Examples:
+    timer = StepTimer()
+    for i in range(train_step):
+      batch_data = seq2seq(...)
+      timer.lap('data') # time since the previous lap is 'data'
+      sess.run(...)
+      timer.lap('run')
+    print(timer.summary()) # => 'data 2.1ms 6%, run 33.0ms 94%'
+    log.record(global_step, **timer.metrics()) # => data_ms, data_p90_ms, run_ms, run_p90_ms
+  """
+
+  def __init__(self):
+    self.phases = OrderedDict() # name -> Histogram
+    self.last = time.perf_counter()
+
+  def lap(self, name=None):
+    """Record time since the previous lap as name, None only restarts the clock."""
+    now = time.perf_counter()
+    if name is not None:
+      if not name in self.phases:
+        self.phases[name] = Histogram()
+      self.phases[name].add(now - self.last)
+    self.last = now
+
+  def summary(self) -> str:
+    """Mean duration and share of each phase, for Monitor suffix."""
+    total = sum(h.total for h in self.phases.values()) or 1.0
+    return ', '.join('{} {:.1f}ms {:.0f}%'.format(name, h.mean() * 1000, h.total / total * 100)
+                     for name, h in self.phases.items())
+
+  def metrics(self) -> dict:
+    """Mean and p90 milliseconds of each phase, for Logger.record."""
+    metrics = dict()
+    for name, h in self.phases.items():
+      metrics['%s_ms' % name] = h.mean() * 1000
+      metrics['%s_p90_ms' % name] = h.percentile(90) * 1000
+    return metrics